@@ -0,0 +1,224 @@
+"""Benchmarks of the hot paths: lattices, meshes, symmetry checks and reductions.
+
+Run them and record the results::
+
+    python benchmarks/bench.py run -o bench.json
+
+and compare a later run with a stored baseline::
+
+    python benchmarks/bench.py compare baseline.json bench.json
+
+Every case records the best wall time of a few repeats and the peak memory traced
+during one extra run. Cases that run over a range of mesh sizes also get a scaling
+exponent, the slope of log(time) against log(number of kpoints).
+"""
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import click
+import numpy as np
+
+from dft_dummy.bravis import BravisLattice, make_lattice_bravis
+from dft_dummy.brillouin import fold_to_bz
+from dft_dummy.crystal_utils import make_mesh
+from dft_dummy.interpolate import fit_star_interpolation
+from dft_dummy.kpoints import find_irreducible_kpts, reduce_kpts, reduce_mesh
+from dft_dummy.symmetry import (
+    check_symmetries,
+    check_symmetry,
+    possible_unitary_rotations,
+)
+from dft_dummy.tetrahedron import make_tetrahedra, reduce_tetrahedra, tetrahedron_dos
+
+LATTICE_PARAMS = {
+    BravisLattice.triclinic: dict(a=1, b=2, c=3, alpha=1.1, beta=1.2, gamma=1.3),
+    BravisLattice.monoclinic: dict(a=1, b=2, c=3, beta=1.2),
+    BravisLattice.orthorhombic: dict(a=1, b=2, c=3),
+    BravisLattice.tetragonal: dict(a=1, c=3),
+    BravisLattice.cubic: dict(a=1),
+    BravisLattice.fcc: dict(a=1),
+    BravisLattice.bcc: dict(a=1),
+    BravisLattice.hcp: dict(a=1, c=2),
+}
+
+Case = Tuple[str, str, int, int, Callable[[], object]]  # name, lattice, size, N, run
+
+
+def measure(func: Callable[[], object], repeat: int) -> Tuple[float, int]:
+    """best wall time in seconds and peak traced memory in bytes of a function"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def _check_symmetry_loop(vec: np.ndarray):
+    return [check_symmetry(sym, vec) for sym in possible_unitary_rotations()]
+
+
+IMPORT_SNIPPETS = {
+    "import_numpy": "import numpy",
+    "import_dft_dummy": "import dft_dummy",
+    "import_dft_dummy_api": (
+        "import dft_dummy;"
+        "dft_dummy.make_lattice_bravis(dft_dummy.BravisLattice.fcc, a=1);"
+        "dft_dummy.make_mesh(4, 4, 4)"
+    ),
+    "import_dft_dummy_kpoints": "import dft_dummy.kpoints",
+}
+
+
+def _run_python(code: str):
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def iter_cases(sizes: List[int], lattices: List[BravisLattice]) -> Iterator[Case]:
+    """all benchmark cases, cheap ones first. Import cases run in a fresh
+    interpreter, so their peak memory is not traced."""
+    for name, code in IMPORT_SNIPPETS.items():
+        yield name, "", 0, 1, lambda: _run_python(code)
+    for brav in lattices:
+        kwargs = LATTICE_PARAMS[brav]
+        vec, _ = make_lattice_bravis(brav, **kwargs)
+        yield "make_lattice_bravis", brav.name, 0, 1, lambda: make_lattice_bravis(
+            brav, **kwargs
+        )
+        yield "check_symmetry", brav.name, 0, 1, lambda: _check_symmetry_loop(vec)
+        yield "check_symmetries", brav.name, 0, 1, lambda: check_symmetries(
+            possible_unitary_rotations(), vec
+        )
+    for n in sizes:
+        yield "make_mesh", "", n, n ** 3, lambda: make_mesh(n, n, n)
+    for brav in lattices:
+        vec, _ = make_lattice_bravis(brav, **LATTICE_PARAMS[brav])
+        irr = find_irreducible_kpts(make_mesh(8, 8, 8), vec)
+        interp = fit_star_interpolation(irr.kpts, irr.kpts[:, 0], vec)
+        for n in sizes:
+            kpts = make_mesh(n, n, n)
+            yield "reduce_kpts", brav.name, n, n ** 3, lambda: reduce_kpts(kpts, vec)
+            yield "reduce_kpts_f32", brav.name, n, n ** 3, lambda: reduce_kpts(
+                kpts, vec, dtype=np.float32
+            )
+            yield "reduce_mesh", brav.name, n, n ** 3, lambda: reduce_mesh(vec, n, n, n)
+            yield "fold_to_bz", brav.name, n, n ** 3, lambda: fold_to_bz(kpts, vec)
+            yield "interpolate", brav.name, n, n ** 3, lambda: interp.evaluate(kpts)
+            yield "interpolate_mesh", brav.name, n, n ** 3, lambda: (
+                interp.evaluate_mesh(n, n, n)
+            )
+            energies = np.cos(2 * np.pi * kpts).sum(axis=1)
+            tetra = make_tetrahedra(vec, n, n, n)
+            omegas = np.linspace(-3, 3, 200)
+            yield "tetrahedron_dos", brav.name, n, n ** 3, lambda: tetrahedron_dos(
+                energies, tetra, omegas
+            )
+            _, labels = reduce_kpts(kpts, vec)
+            _, index = np.unique(labels, return_index=True)
+            yield "reduce_tetrahedra", brav.name, n, n ** 3, lambda: (
+                reduce_tetrahedra(tetra, labels)
+            )
+            reduced = reduce_tetrahedra(tetra, labels)
+            yield "tetrahedron_dos_irr", brav.name, n, n ** 3, lambda: tetrahedron_dos(
+                energies[index], reduced, omegas
+            )
+
+
+def scaling_exponents(records: List[Dict]) -> Dict[str, float]:
+    """slope of log(time) against log(N) for every case run over several sizes"""
+    groups: Dict[str, List[Tuple[int, float]]] = {}
+    for rec in records:
+        if rec["size"] > 0:
+            key = f"{rec['name']}[{rec['lattice']}]"
+            groups.setdefault(key, []).append((rec["npts"], rec["time"]))
+    exponents = {}
+    for key, points in groups.items():
+        if len(points) > 1:
+            npts, times = np.log(np.array(points)).T
+            exponents[key] = float(np.polyfit(npts, times, 1)[0])
+    return exponents
+
+
+@click.group()
+def cli():
+    """benchmarks of dft_dummy"""
+
+
+@cli.command()
+@click.option("-o", "--output", default="bench.json", help="JSON file of results")
+@click.option("--sizes", default="4,8,16,24,32,48,64", help="mesh sizes along axes")
+@click.option(
+    "--lattice",
+    "lattices",
+    type=click.Choice([brav.name for brav in LATTICE_PARAMS]),
+    multiple=True,
+    help="lattices, default all with parameters",
+)
+@click.option("--repeat", default=3, help="number of timed runs of each case")
+def run(output: str, sizes: str, lattices: Tuple[str], repeat: int):
+    """time every case and write the results into a JSON file"""
+    mesh_sizes = [int(n) for n in sizes.split(",")]
+    bravs = [BravisLattice[name] for name in lattices] or list(LATTICE_PARAMS)
+    records = []
+    for name, lattice, size, npts, func in iter_cases(mesh_sizes, bravs):
+        elapsed, peak = measure(func, repeat)
+        records.append(
+            dict(
+                name=name,
+                lattice=lattice,
+                size=size,
+                npts=npts,
+                time=elapsed,
+                peak_memory=peak,
+            )
+        )
+        click.echo(
+            f"{name:>20} {lattice:>12} {size:>4} {elapsed * 1e3:12.3f} ms"
+            f" {peak / 2 ** 20:10.2f} MiB"
+        )
+    result = dict(records=records, scaling=scaling_exponents(records))
+    for key, exponent in result["scaling"].items():
+        click.echo(f"{key:>36} scales as N^{exponent:.2f}")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+
+@cli.command()
+@click.argument("baseline", type=click.Path(exists=True))
+@click.argument("current", type=click.Path(exists=True))
+@click.option("--threshold", default=1.25, help="slowdown ratio seen as regression")
+def compare(baseline: str, current: str, threshold: float):
+    """flag cases that got slower or use more memory than in the baseline"""
+
+    def load(path: str) -> Dict[Tuple, Dict]:
+        with open(path) as f:
+            records = json.load(f)["records"]
+        return {(r["name"], r["lattice"], r["size"]): r for r in records}
+
+    base, cur = load(baseline), load(current)
+    regressions = 0
+    for key in sorted(base.keys() & cur.keys()):
+        time_ratio = cur[key]["time"] / max(base[key]["time"], 1e-12)
+        memory_ratio = cur[key]["peak_memory"] / max(base[key]["peak_memory"], 1)
+        flag = time_ratio > threshold or memory_ratio > threshold
+        regressions += flag
+        click.echo(
+            f"{'REGRESSION' if flag else 'ok':>10} {key[0]:>20} {key[1]:>12}"
+            f" {key[2]:>4} time x{time_ratio:.2f} memory x{memory_ratio:.2f}"
+        )
+    click.echo(f"{regressions} regressions in {len(base.keys() & cur.keys())} cases")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    cli()
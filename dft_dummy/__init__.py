@@ -1 +1,44 @@
+"""Density Functional Theorem for Dummies
+
+The most used functions are available from the top level, but their modules are
+only imported at first use, so `import dft_dummy` is cheap and building lattices
+and meshes costs no more than importing numpy.
+"""
+from importlib import import_module
+from typing import List
+
 __version__ = "0.0.2.dev1"
+
+_LAZY_API = {
+    "BravisLattice": "bravis",
+    "make_lattice_bravis": "bravis",
+    "make_lattice_bravis_batch": "bravis",
+    "make_mesh": "crystal_utils",
+    "iter_mesh": "crystal_utils",
+    "find_symmetry_ops": "symmetry",
+    "SymmetryMode": "symmetry",
+    "reduce_kpts": "kpoints",
+    "reduce_mesh": "kpoints",
+    "find_irreducible_kpts": "kpoints",
+    "iter_irreducible_mesh": "kpoints",
+    "fold_to_bz": "brillouin",
+    "find_space_group": "spacegroup",
+    "fit_star_interpolation": "interpolate",
+    "make_tetrahedra": "tetrahedron",
+    "reduce_tetrahedra": "tetrahedron",
+    "tetrahedron_dos": "tetrahedron",
+    "find_fermi_level": "tetrahedron",
+    "tetrahedron_weights": "tetrahedron",
+}
+
+__all__ = list(_LAZY_API)
+
+
+def __getattr__(name: str):
+    if name in _LAZY_API:
+        return getattr(import_module(f"{__name__}.{_LAZY_API[name]}"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + __all__)
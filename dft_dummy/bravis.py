@@ -35,16 +35,70 @@ def make_lattice_general(
         Tuple[np.ndarray, float]: Lattice vectors (3x3) and volume
     """
     cartisian = np.eye(3)
+    cos_alpha, cos_beta, cos_gamma = np.cos(alpha), np.cos(beta), np.cos(gamma)
+    sin_gamma = np.sin(gamma)
     a1 = a * cartisian[0]
-    a2 = b * np.cos(gamma) * cartisian[0] + b * np.sin(gamma) * cartisian[1]
-    cx = c * np.cos(beta)
-    cy = c * (np.cos(alpha) - np.cos(beta) * np.cos(gamma)) / np.sin(gamma)
+    a2 = b * cos_gamma * cartisian[0] + b * sin_gamma * cartisian[1]
+    cx = c * cos_beta
+    cy = c * (cos_alpha - cos_beta * cos_gamma) / sin_gamma
     cz = np.sqrt(c * c - cx * cx - cy * cy)
     a3 = np.dot([cx, cy, cz], cartisian)
-    volume = a * b * cz * np.sin(gamma)
+    volume = a * b * cz * sin_gamma
     return np.vstack((a1, a2, a3)), volume
 
 
+def make_lattice_general_batch(
+    a: np.ndarray,
+    b: np.ndarray,
+    c: np.ndarray,
+    alpha: np.ndarray,
+    beta: np.ndarray,
+    gamma: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """same as `make_lattice_general` but for arrays of parameters, which are
+    broadcast against each other
+
+    Args:
+        a, b, c (np.ndarray): M lattice constants, no unit
+        alpha, beta, gamma (np.ndarray): M angles, 0-pi
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Lattice vectors (Mx3x3) and volumes (M)
+    """
+    a, b, c, alpha, beta, gamma = (
+        arr.ravel()
+        for arr in np.broadcast_arrays(
+            *(np.asarray(p, dtype=float) for p in (a, b, c, alpha, beta, gamma))
+        )
+    )
+    cos_alpha, cos_beta, cos_gamma = np.cos(alpha), np.cos(beta), np.cos(gamma)
+    sin_gamma = np.sin(gamma)
+    vec = np.zeros((len(a), 3, 3))
+    vec[:, 0, 0] = a
+    vec[:, 1, 0] = b * cos_gamma
+    vec[:, 1, 1] = b * sin_gamma
+    cx = vec[:, 2, 0] = c * cos_beta
+    cy = vec[:, 2, 1] = c * (cos_alpha - cos_beta * cos_gamma) / sin_gamma
+    cz = vec[:, 2, 2] = np.sqrt(c * c - cx * cx - cy * cy)
+    return vec, a * b * cz * sin_gamma
+
+
+_FCC = np.array(
+    [
+        [0.5, 0.0, 0.5],
+        [0.5, 0.5, 0.0],
+        [0.0, 0.5, 0.5],
+    ]
+)
+_BCC = np.array(
+    [
+        [1, 1, 1],
+        [1, -1, 1],
+        [-1, 1, 1],
+    ]
+)
+
+
 class BravisLattice(str, Enum):
     triclinic = "Triclinic"
     monoclinic = "Monoclinic"
@@ -89,30 +143,9 @@ def make_lattice_bravis(
     elif bravis == BravisLattice.cubic:
         return (a * np.eye(3), a * a * a)
     elif bravis == BravisLattice.fcc:
-        return (
-            a
-            * np.array(
-                [
-                    [0.5, 0.0, 0.5],
-                    [0.5, 0.5, 0.0],
-                    [0.0, 0.5, 0.5],
-                ]
-            ),
-            0.25 * a * a * a,
-        )
+        return (a * _FCC, 0.25 * a * a * a)
     elif bravis == BravisLattice.bcc:
-        return (
-            0.5
-            * a
-            * np.array(
-                [
-                    [1, 1, 1],
-                    [1, -1, 1],
-                    [-1, 1, 1],
-                ]
-            ),
-            0.5 * a * a * a,
-        )
+        return (0.5 * a * _BCC, 0.5 * a * a * a)
     elif bravis == BravisLattice.hcp:
         c = kwargs["c"] / a
         vec = a * np.array([[1, 0, 0], [-1 / 2, np.sqrt(3) / 2, 0], [0, 0, c]])
@@ -121,3 +154,55 @@ def make_lattice_bravis(
         raise ValueError(f"unsupported Bravis Lattice, {bravis}")
 
     return make_lattice_general(**kwargs)
+
+
+def make_lattice_bravis_batch(
+    bravis: BravisLattice, **kwargs: Dict[str, np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """same as `make_lattice_bravis` but for arrays of parameters, which are
+    broadcast against each other
+
+    Args:
+        bravis (BravisLattice): type of Bravis lattice
+
+    Keyword Args:
+        a, b, c, alpha, beta, gamma: arrays of M parameters
+
+    Raises:
+        ValueError: wrong bravis lattice
+        KeyError: missing parameters
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Lattice vectors (Mx3x3) and volumes (M)
+    """
+    params = {k: np.asarray(v, dtype=float) for k, v in kwargs.items()}
+    a = params["a"]  # first lattice constant
+    right = np.pi / 2
+    if bravis == BravisLattice.triclinic:
+        args = [params[k] for k in ("a", "b", "c", "alpha", "beta", "gamma")]
+    elif bravis == BravisLattice.monoclinic:
+        args = [a, params["b"], params["c"], right, params["beta"], right]
+    elif bravis == BravisLattice.orthorhombic:
+        args = [a, params["b"], params["c"], right, right, right]
+    elif bravis == BravisLattice.tetragonal:
+        args = [a, a, params["c"], right, right, right]
+    elif bravis in (BravisLattice.cubic, BravisLattice.fcc, BravisLattice.bcc):
+        unit, unit_volume = {
+            BravisLattice.cubic: (np.eye(3), 1.0),
+            BravisLattice.fcc: (_FCC, 0.25),
+            BravisLattice.bcc: (0.5 * _BCC, 0.5),
+        }[bravis]
+        a = a.ravel()
+        return a[:, None, None] * unit, unit_volume * a * a * a
+    elif bravis == BravisLattice.hcp:
+        a, c = (arr.ravel() for arr in np.broadcast_arrays(a, params["c"]))
+        vec = np.zeros((len(a), 3, 3))
+        vec[:, 0, 0] = a
+        vec[:, 1, 0] = -a / 2
+        vec[:, 1, 1] = a * np.sqrt(3) / 2
+        vec[:, 2, 2] = c
+        return vec, np.abs(np.linalg.det(vec))
+    else:
+        raise ValueError(f"unsupported Bravis Lattice, {bravis}")
+
+    return make_lattice_general_batch(*args)
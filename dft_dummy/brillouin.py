@@ -0,0 +1,118 @@
+"""Folding of kpoints into the first Brillouin zone, the Wigner-Seitz cell of the
+reciprocal lattice around the origin, i.e. every kpoint is moved to its shortest
+periodic image in the cartisian system.
+
+A kpoint is first wrapped into the parallelepiped [-1/2, 1/2)^3 of the reciprocal
+basis, then the closest reciprocal lattice vector G is subtracted. Within the
+parallelepiped, |k| <= R, where R is the distance to its farthest corner, and G is
+only closer to k than the origin if |G| <= 2|k|. So the shell |G| <= 2R holds every
+candidate, and only the ones whose bisecting plane cuts the parallelepiped are kept.
+They are found once per lattice, and all the kpoints of a chunk are compared with
+all the candidates at once with one matrix product. Kpoints are folded in the
+reduced reciprocal basis, see `reduce_lattice`, where the candidates are few.
+"""
+from typing import Callable
+
+import numpy as np
+
+from dft_dummy.crystal_utils import calc_reciprocal, reduce_lattice
+
+
+def find_reciprocal_shells(vec: np.ndarray, tol: float = 1e-6) -> np.ndarray:
+    """find the reciprocal lattice vectors that can be the closest one to a kpoint
+    in the parallelepiped [-1/2, 1/2)^3 of the reciprocal basis
+
+    Args:
+        vec (np.ndarray): 3x3 lattice basis vectors
+        tol (float): numerical tolerance. Defaults to 1e-6.
+
+    Returns:
+        np.ndarray: Gx3 integer reciprocal lattice vectors in crystal coordinates,
+            ordered by length and then lexicographically, the origin first
+    """
+    vec = np.asarray(vec, dtype=float)
+    rvec = calc_reciprocal(vec)
+    corners = np.array(np.meshgrid(*[[-0.5, 0.5]] * 3)).reshape(3, -1)
+    radius = 2 * np.linalg.norm(rvec @ corners, axis=0).max() * (1 + tol)
+    # n = vec @ G, so |n_i| <= |a_i| |G| along every axis
+    bounds = np.floor(radius * np.linalg.norm(vec, axis=1)).astype(int)
+    grid = np.meshgrid(*[np.arange(-b, b + 1) for b in bounds], indexing="ij")
+    shells = np.stack(grid, axis=-1).reshape(-1, 3)
+    # G is only ever closer if some k in the parallelepiped is beyond the plane
+    # bisecting G, k.G >= |G|^2 / 2, and max k.G = |metric @ n|_1 / 2
+    metric = rvec.T @ rvec
+    dots = shells @ metric
+    lengths = np.sum(dots * shells, axis=1)
+    reachable = np.abs(dots).sum(axis=1) >= lengths * (1 - tol)
+    shells, lengths = shells[reachable], lengths[reachable]
+    # lexsort sorts by the last key first
+    keys = (shells[:, 2], shells[:, 1], shells[:, 0], np.round(lengths / tol))
+    return shells[np.lexsort(keys)]
+
+
+def make_bz_fold(
+    vec: np.ndarray, tol: float = 1e-6, chunk_size: int = 65536
+) -> Callable[[np.ndarray], np.ndarray]:
+    """make a function that folds kpoints into the first Brillouin zone of a
+    lattice. The candidate reciprocal lattice vectors are found only once, see
+    `find_reciprocal_shells`.
+
+    Kpoints on the zone boundary have several images of the same length. The one
+    reached with the first candidate is taken, so such kpoints are not moved unless
+    they have to be.
+
+    Args:
+        vec (np.ndarray): 3x3 lattice basis vectors
+        tol (float): numerical tolerance, images whose lengths differ by less are
+            equally short. Defaults to 1e-6.
+        chunk_size (int): number of kpoints folded at a time, the memory is bounded
+            by it times the number of candidates. Defaults to 65536.
+
+    Returns:
+        Callable[[np.ndarray], np.ndarray]: function mapping Nx3 kpoints in crystal
+            coordinates to their Nx3 images in the first Brillouin zone, also in
+            crystal coordinates. The differences are integers.
+    """
+    if chunk_size <= 0:
+        raise ValueError("invalid chunk size")
+    # rows of `recip` are the reduced reciprocal basis, U @ rvec.T, and kpoints
+    # in crystal coordinates become k @ inv(U) in it
+    recip, trans = reduce_lattice(calc_reciprocal(np.asarray(vec, dtype=float)).T)
+    inv_trans = np.round(np.linalg.inv(trans))
+    rvec = recip.T
+    shells = find_reciprocal_shells(calc_reciprocal(rvec), tol)
+    shells_cart = shells @ rvec.T
+    # |k - G|^2 - |k|^2 = |G|^2 - 2 k.G, precomputed as [|G|^2; -2 G] for a product
+    weights = np.vstack((np.sum(shells_cart ** 2, axis=1), -2 * shells_cart.T))
+    scale = np.sum(shells_cart ** 2, axis=1).max()
+
+    def fold(kpts: np.ndarray) -> np.ndarray:
+        kpts = np.asarray(kpts, dtype=float).reshape(-1, 3) @ inv_trans
+        folded = kpts - np.rint(kpts)
+        for start in range(0, len(folded), chunk_size):
+            block = folded[start : start + chunk_size]
+            cart = block @ rvec.T
+            dists = np.column_stack((np.ones(len(block)), cart)) @ weights
+            shortest = dists <= dists.min(axis=1, keepdims=True) + tol * scale
+            block -= shells[shortest.argmax(axis=1)]
+        return folded @ trans
+
+    return fold
+
+
+def fold_to_bz(
+    kpts: np.ndarray, vec: np.ndarray, tol: float = 1e-6, chunk_size: int = 65536
+) -> np.ndarray:
+    """fold kpoints into the first Brillouin zone of a lattice, see `make_bz_fold`
+    to fold many lists of kpoints of the same lattice
+
+    Args:
+        kpts (np.ndarray): Nx3 kpoints in crystal coordinates
+        vec (np.ndarray): 3x3 lattice basis vectors
+        tol, chunk_size: same as `make_bz_fold`
+
+    Returns:
+        np.ndarray: Nx3 images of the kpoints in the first Brillouin zone, in
+            crystal coordinates
+    """
+    return make_bz_fold(vec, tol, chunk_size)(kpts)
@@ -0,0 +1,176 @@
+"""Command line tool: make a lattice and a kmesh, then write out the irreducible
+kpoints and their weights.
+
+    dft-dummy kmesh fcc --a 1 --mesh 8 8 8 --shift 1 1 1
+    dft-dummy batch lattices.jsonl --mesh 8 8 8 --workers 8 -d out/
+
+Every output row is the crystal coordinates of an irreducible kpoint followed by its
+weight, as text, as an Mx4 `.npy` array or as raw little-endian float64 rows. Rows
+are written as soon as they are found for text and raw output.
+
+The kpoint modules are only imported when a command runs, so `--help` and argument
+errors do not pay for them.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Iterator, Tuple
+
+import click
+import numpy as np
+
+from dft_dummy.bravis import BravisLattice, make_lattice_bravis
+from dft_dummy.symmetry import SymmetryMode
+
+FORMATS = {"text": "txt", "npy": "npy", "bin": "bin"}  # format and file extension
+LATTICE_PARAMS = ("a", "b", "c", "alpha", "beta", "gamma")
+
+
+def iter_irreducible_rows(
+    params: Dict[str, float],
+    nums: Tuple[int, int, int],
+    shifts: Tuple[bool, bool, bool],
+    mode: SymmetryMode,
+) -> Iterator[np.ndarray]:
+    """make a lattice from `bravis` and its parameters, then yield blocks of
+    rows of the irreducible kpoints and weights of its kmesh"""
+    from dft_dummy.kpoints import iter_irreducible_mesh
+
+    params = dict(params)
+    bravis = BravisLattice[params.pop("bravis")]
+    vec, _ = make_lattice_bravis(bravis, **params)
+    for _, kpts, weights in iter_irreducible_mesh(vec, *nums, *shifts, mode=mode):
+        yield np.column_stack((kpts, weights))
+
+
+def write_rows(blocks: Iterator[np.ndarray], fmt: str, stream: BinaryIO) -> int:
+    """write blocks of rows into a binary stream, return the number of rows"""
+    nrows = 0
+    if fmt == "npy":
+        # the shape goes into the header, so the rows are written all at once
+        rows = np.concatenate(list(blocks) or [np.empty((0, 4))])
+        np.save(stream, rows)
+        return len(rows)
+    for block in blocks:
+        if fmt == "text":
+            np.savetxt(stream, block, fmt=["%.12f"] * 3 + ["%d"])
+        else:
+            stream.write(block.astype("<f8").tobytes())
+        stream.flush()
+        nrows += len(block)
+    return nrows
+
+
+def _reduce_to_file(
+    params: Dict[str, float],
+    nums: Tuple[int, int, int],
+    shifts: Tuple[bool, bool, bool],
+    mode: SymmetryMode,
+    fmt: str,
+    path: str,
+) -> int:
+    """batch worker: reduce one lattice and write its rows into a file"""
+    with open(path, "wb") as f:
+        return write_rows(iter_irreducible_rows(params, nums, shifts, mode), fmt, f)
+
+
+def _mesh_options(func):
+    func = click.option(
+        "--mode",
+        type=click.Choice([m.value for m in SymmetryMode]),
+        default=SymmetryMode.full.value,
+        help="symmetry operations to reduce with, rotations drops the improper ones"
+        " and time reversal",
+    )(func)
+    func = click.option(
+        "--format",
+        "fmt",
+        type=click.Choice(list(FORMATS)),
+        default="text",
+        help="output format",
+    )(func)
+    func = click.option(
+        "--shift",
+        nargs=3,
+        type=click.IntRange(0, 1),
+        default=(0, 0, 0),
+        help="1 to offset half a step along a crystal axis",
+    )(func)
+    func = click.option(
+        "--mesh",
+        nargs=3,
+        type=int,
+        required=True,
+        help="number of points along the crystal axes",
+    )(func)
+    return func
+
+
+@click.group()
+def cli():
+    """kmeshes and their irreducible kpoints"""
+
+
+@cli.command()
+@click.argument("bravis", type=click.Choice([b.name for b in BravisLattice]))
+@click.option("--a", type=float, required=True, help="first lattice constant")
+@click.option("--b", type=float, help="second lattice constant")
+@click.option("--c", type=float, help="third lattice constant")
+@click.option("--alpha", type=float, help="angle between b&c in radians")
+@click.option("--beta", type=float, help="angle between a&c in radians")
+@click.option("--gamma", type=float, help="angle between a&b in radians")
+@_mesh_options
+@click.option("-o", "--output", default="-", help="output file, - for stdout")
+def kmesh(bravis, mesh, shift, fmt, mode, output, **kwargs):
+    """irreducible kpoints of the kmesh of one BRAVIS lattice"""
+    params = {k: v for k, v in kwargs.items() if v is not None}
+    params["bravis"] = bravis
+    blocks = iter_irreducible_rows(params, mesh, shift, SymmetryMode(mode))
+    with click.open_file(output, "wb") as f:
+        try:
+            write_rows(blocks, fmt, f)
+        except (KeyError, TypeError) as err:
+            raise click.UsageError(f"missing lattice parameter for {bravis}, {err}")
+        except ValueError as err:
+            raise click.UsageError(f"invalid lattice {bravis}, {err}")
+
+
+@cli.command()
+@click.argument("lattices", type=click.File("r"))
+@_mesh_options
+@click.option("-d", "--output-dir", default=".", help="folder of the output files")
+@click.option("--workers", type=int, default=None, help="number of processes")
+def batch(lattices, mesh, shift, fmt, mode, output_dir, workers):
+    """irreducible kpoints of the kmeshes of many lattices in parallel.
+
+    LATTICES is a file with one JSON object per line, holding `bravis` and the
+    lattice parameters, e.g. {"bravis": "hcp", "a": 1, "c": 1.6}. The result of
+    the i-th lattice goes into the file <i>.<format> in the output folder.
+    """
+    params = [json.loads(line) for line in lattices if line.strip()]
+    for i, param in enumerate(params):
+        unknown = set(param) - set(LATTICE_PARAMS) - {"bravis"}
+        if param.get("bravis") not in BravisLattice.__members__ or unknown:
+            raise click.UsageError(f"invalid lattice on line {i + 1}, {param}")
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [
+        os.path.join(output_dir, f"{i}.{FORMATS[fmt]}") for i in range(len(params))
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = [
+            pool.submit(
+                _reduce_to_file, param, mesh, shift, SymmetryMode(mode), fmt, path
+            )
+            for param, path in zip(params, paths)
+        ]
+        for path, param, task in zip(paths, params, tasks):
+            try:
+                click.echo(f"{path} {task.result()}")
+            except (KeyError, TypeError) as err:
+                raise click.UsageError(f"missing lattice parameter, {err} {param}")
+            except ValueError as err:
+                raise click.UsageError(f"invalid lattice, {err} {param}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,14 +1,19 @@
 """crystal system utilities such as coordinate transformation, etc"""
+from typing import Iterator, Tuple
 
 import numpy as np
 
 
-def project_points(vec: np.ndarray, pts: np.ndarray) -> np.ndarray:
+def project_points(
+    vec: np.ndarray, pts: np.ndarray, dtype: np.dtype = None
+) -> np.ndarray:
     """project list of points onto the given basis vectors
 
     Args:
         vec (np.ndarray): 3x3 basis vectors
         pts (np.ndarray): Nx3 points in the basis vector coordinates
+        dtype (np.dtype): data type to compute in, e.g. np.float32 for large
+            lists of points. Defaults to None, the type of `vec` and `pts`.
 
     Returns:
         np.ndarray: Nx3 projected points
@@ -16,6 +21,8 @@ def project_points(vec: np.ndarray, pts: np.ndarray) -> np.ndarray:
     if pts.shape[-1] != 3:
         raise ValueError("invalid points")
     pts = pts.reshape(-1, 3)
+    if dtype is not None:
+        vec, pts = vec.astype(dtype, copy=False), pts.astype(dtype, copy=False)
 
     return vec.dot(pts.T).T
 
@@ -32,14 +39,138 @@ def calc_reciprocal(vec: np.ndarray) -> np.ndarray:
     return np.linalg.inv(vec)
 
 
+def _size_reduce(vec: np.ndarray, tol: float) -> np.ndarray:
+    """integer matrix of a basis where every vector has lost the nearest integer
+    multiple of every other one, so very skewed bases need only a few passes"""
+    trans = np.eye(3, dtype=np.int64)
+    changed = True
+    while changed:
+        changed = False
+        for i, j in ((0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1)):
+            base = trans @ vec
+            ratio = base[i] @ base[j] / (base[j] @ base[j])
+            if abs(ratio) > 0.5 + tol:
+                trans[i] -= int(np.round(ratio)) * trans[j]
+                changed = True
+    return trans
+
+
+def _selling_reduce(vec: np.ndarray, trans: np.ndarray, tol: float) -> np.ndarray:
+    """4x3 integer coefficients of an obtuse superbase, no two vectors of which
+    have a positive scalar product, starting from the basis `trans @ vec`"""
+    coeffs = np.vstack((-trans.sum(axis=0), trans))
+    while True:
+        base = coeffs @ vec
+        dots = base @ base.T
+        eps = tol * np.max(np.diag(dots))
+        dots = np.triu(dots, 1)
+        i, j = np.unravel_index(np.argmax(dots), dots.shape)
+        if dots[i, j] <= eps:
+            return coeffs
+        others = [k for k in range(4) if k not in (i, j)]
+        coeffs[others] += coeffs[i]
+        coeffs[i] = -coeffs[i]
+
+
+def reduce_lattice(vec: np.ndarray, tol: float = 1e-6) -> Tuple[np.ndarray, np.ndarray]:
+    """find a short, nearly orthogonal basis of the same lattice, by the Delaunay
+    (Selling) reduction. After a size reduction of the basis, the four vectors
+    b0 = -(b1 + b2 + b3), b1, b2 and b3 are changed until no two of them have a
+    positive scalar product, then the three shortest linearly independent ones of
+    b0..b3 and b0 + b1, b0 + b2, b0 + b3 are taken. A basis as short as that one
+    already is kept as it is.
+
+    Symmetry detection and kpoint reduction work in such a basis, the tolerance
+    checks lose precision in strongly skewed ones.
+
+    Args:
+        vec (np.ndarray): 3x3 basis vectors
+        tol (float): numerical tolerance, relative to the squared length of the
+            longest reduced vector. Defaults to 1e-6.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: 3x3 reduced basis vectors, ordered by
+            length unless `vec` is kept, and the 3x3 integer matrix T with
+            determinant 1 that makes them, reduced = T @ vec. Kpoints in crystal
+            coordinates become T @ k.
+    """
+    vec = np.asarray(vec, dtype=float)
+    coeffs = _selling_reduce(vec, _size_reduce(vec, tol), tol)
+    eps = tol * np.max(np.sum((coeffs @ vec) ** 2, axis=1))
+    candidates = np.vstack((coeffs, coeffs[0] + coeffs[1:]))
+    lengths = np.sum((candidates @ vec) ** 2, axis=1)
+    chosen = []
+    for k in np.argsort(np.round(lengths / eps), kind="stable"):
+        if np.linalg.matrix_rank(candidates[chosen + [k]]) > len(chosen):
+            chosen.append(k)
+        if len(chosen) == 3:
+            break
+    if abs(round(np.linalg.det(candidates[chosen]))) != 1:
+        # not a basis of the lattice, b1, b2 and b3 always are
+        chosen = sorted(range(1, 4), key=lambda k: lengths[k])
+    if np.all(np.sort(np.sum(vec ** 2, axis=1)) <= lengths[chosen] + eps):
+        return vec, np.eye(3, dtype=int)
+
+    trans = candidates[chosen]
+    if np.linalg.det(trans) < 0:
+        trans = -trans
+    return trans @ vec, trans
+
+
+def compact_tol(tol: float, dtype: np.dtype) -> float:
+    """adjust a tolerance to the precision of a float type, coordinates in the
+    [0, 1) cell can not be compared any finer than a few ulps of it
+
+    Args:
+        tol (float): numerical tolerance
+        dtype (np.dtype): float type of the coordinates
+
+    Returns:
+        float: `tol`, or the coarsest resolution of `dtype` if larger
+    """
+    return max(tol, 64 * float(np.finfo(dtype).eps))
+
+
+def index_dtype(num: int) -> np.dtype:
+    """integer type of indices into `num` items, with -1 for missing ones. int32
+    halves the memory of int64 and is used whenever it is large enough.
+
+    Args:
+        num (int): number of items
+
+    Returns:
+        np.dtype: np.int32 or np.int64
+    """
+    return np.dtype(np.int32 if num < np.iinfo(np.int32).max else np.int64)
+
+
+def _check_mesh(nx: int, ny: int, nz: int):
+    if nx <= 0 or ny <= 0 or nz <= 0:
+        raise ValueError("invalid number of points")
+
+
+def _mesh_axis(idx: np.ndarray, num: int, shift: bool) -> np.ndarray:
+    """coordinates of points along one crystal axis given their indices"""
+    return idx * (1 / num) + 1 / num / 2 * shift
+
+
 def make_mesh(
-    nx: int, ny: int, nz: int, dx: bool = False, dy: bool = False, dz: bool = False
+    nx: int,
+    ny: int,
+    nz: int,
+    dx: bool = False,
+    dy: bool = False,
+    dz: bool = False,
+    dtype: np.dtype = np.float64,
 ) -> np.ndarray:
     """make a uniformly distributed mesh, like in a Monkhorst-Pack grid but instead of
     centering at the origin, this mesh starts off from the origin. Both of them spread
     evenly in the first Brillouin Zone and are essentially equivalent. The returned
     array is in the crytal coordinates, NOT necessarily the cartisian system.
 
+    The points are ordered by the 2nd, 1st and then 3rd crystal axis, the last one
+    changing the fastest. See `mesh_points` for the closed form of the mapping.
+
     Args:
         nx (int): number of points along 1st crytal axis
         ny (int): number of points along 2nd crytal axis
@@ -47,16 +178,137 @@ def make_mesh(
         dx (bool): to offset half a step along 1st crytal axis
         dy (bool): to offset half a step along 2nd crytal axis
         dz (bool): to offset half a step along 3rd crytal axis
+        dtype (np.dtype): data type of the mesh. Defaults to np.float64.
 
     Returns:
         np.ndarray: Nx3 mesh, where N == nx * ny * nz
     """
-    if nx <= 0 or ny <= 0 or nz <= 0:
-        raise ValueError("invalid number of points")
-    nstep_x = np.linspace(0, 1, num=nx, endpoint=False)
-    nstep_y = np.linspace(0, 1, num=ny, endpoint=False)
-    nstep_z = np.linspace(0, 1, num=nz, endpoint=False)
-    x, y, z = np.meshgrid(nstep_x, nstep_y, nstep_z)
-    pts = np.array([x.flatten(), y.flatten(), z.flatten()]).T
-    offset = np.array([1 / nx / 2 * dx, 1 / ny / 2 * dy, 1 / nz / 2 * dz])
-    return pts + offset
+    _check_mesh(nx, ny, nz)
+    # only the returned array is allocated, filled axis by axis by broadcasting
+    pts = np.empty((ny, nx, nz, 3), dtype=dtype)
+    pts[..., 0] = _mesh_axis(np.arange(nx), nx, dx)[None, :, None]
+    pts[..., 1] = _mesh_axis(np.arange(ny), ny, dy)[:, None, None]
+    pts[..., 2] = _mesh_axis(np.arange(nz), nz, dz)[None, None, :]
+    return pts.reshape(-1, 3)
+
+
+def mesh_flat_index(grid: np.ndarray, nx: int, ny: int, nz: int) -> np.ndarray:
+    """turn indices along the crystal axes into indices of the mesh from
+    `make_mesh`, indices out of range are wrapped periodically
+
+    Args:
+        grid (np.ndarray): 3xM indices along the 1st, 2nd and 3rd crystal axis
+        nx, ny, nz: same as `make_mesh`
+
+    Returns:
+        np.ndarray: M indices into the mesh
+    """
+    ix, iy, iz = grid[0] % nx, grid[1] % ny, grid[2] % nz
+    return (iy * nx + ix) * nz + iz
+
+
+def mesh_grid(index: np.ndarray, nx: int, ny: int, nz: int) -> np.ndarray:
+    """turn indices of the mesh from `make_mesh` into indices along the crystal
+    axes, the inverse of `mesh_flat_index`
+
+    Args:
+        index (np.ndarray): M indices into the mesh
+        nx, ny, nz: same as `make_mesh`
+
+    Returns:
+        np.ndarray: 3xM indices along the 1st, 2nd and 3rd crystal axis
+    """
+    iy, rest = np.divmod(index, nx * nz)
+    ix, iz = np.divmod(rest, nz)
+    return np.array([ix, iy, iz])
+
+
+def mesh_points(
+    index: np.ndarray,
+    nx: int,
+    ny: int,
+    nz: int,
+    dx: bool = False,
+    dy: bool = False,
+    dz: bool = False,
+    dtype: np.dtype = np.float64,
+) -> np.ndarray:
+    """compute points of the mesh from `make_mesh` by their indices, without
+    making the mesh
+
+    Args:
+        index (np.ndarray): M indices into the mesh
+        nx, ny, nz, dx, dy, dz: same as `make_mesh`
+        dtype (np.dtype): data type of the points. Defaults to np.float64.
+
+    Returns:
+        np.ndarray: Mx3 points, same as `make_mesh(...)[index]`
+    """
+    _check_mesh(nx, ny, nz)
+    ix, iy, iz = mesh_grid(np.asarray(index).ravel(), nx, ny, nz)
+    pts = np.empty((len(iy), 3), dtype=dtype)
+    pts[:, 0] = _mesh_axis(ix, nx, dx)
+    pts[:, 1] = _mesh_axis(iy, ny, dy)
+    pts[:, 2] = _mesh_axis(iz, nz, dz)
+    return pts
+
+
+def mesh_index(
+    pts: np.ndarray,
+    nx: int,
+    ny: int,
+    nz: int,
+    dx: bool = False,
+    dy: bool = False,
+    dz: bool = False,
+    tol: float = 1e-6,
+) -> np.ndarray:
+    """compute indices of points in the mesh from `make_mesh`, without making the
+    mesh. This is the inverse of `mesh_points`, periodic images of a mesh point
+    have the same index.
+
+    Args:
+        pts (np.ndarray): Mx3 points in crystal coordinates
+        nx, ny, nz, dx, dy, dz: same as `make_mesh`
+        tol (float): numerical tolerance. Defaults to 1e-6.
+
+    Returns:
+        np.ndarray: M indices into the mesh, -1 for points not on the mesh
+    """
+    _check_mesh(nx, ny, nz)
+    nums = np.array([nx, ny, nz])
+    steps = np.asarray(pts, dtype=float).reshape(-1, 3) * nums
+    steps -= 0.5 * np.array([dx, dy, dz])
+    grid = np.round(steps).astype(np.int64)
+    on_mesh = np.linalg.norm((steps - grid) / nums, axis=1) < tol
+    return np.where(on_mesh, mesh_flat_index(grid.T, nx, ny, nz), -1)
+
+
+def iter_mesh(
+    nx: int,
+    ny: int,
+    nz: int,
+    dx: bool = False,
+    dy: bool = False,
+    dz: bool = False,
+    chunk_size: int = 65536,
+    dtype: np.dtype = np.float64,
+) -> Iterator[np.ndarray]:
+    """make the mesh from `make_mesh` block by block, so that very dense meshes
+    can be processed in bounded memory
+
+    Args:
+        nx, ny, nz, dx, dy, dz: same as `make_mesh`
+        chunk_size (int): maximum number of points in a block. Defaults to 65536.
+        dtype (np.dtype): data type of the mesh. Defaults to np.float64.
+
+    Yields:
+        np.ndarray: Mx3 consecutive blocks of the mesh, M <= chunk_size
+    """
+    _check_mesh(nx, ny, nz)
+    if chunk_size <= 0:
+        raise ValueError("invalid chunk size")
+    npts = nx * ny * nz
+    for start in range(0, npts, chunk_size):
+        index = np.arange(start, min(start + chunk_size, npts))
+        yield mesh_points(index, nx, ny, nz, dx, dy, dz, dtype)
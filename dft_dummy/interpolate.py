@@ -0,0 +1,271 @@
+"""Interpolation of quantities of the irreducible kpoints, like band energies, onto
+dense meshes and paths with symmetrized Fourier series, the star functions of
+[Pickett, Krakauer and Allen, PRB 38, 2721 (1988)].
+
+A star is the set of lattice vectors n, in crystal coordinates of the lattice, that
+a symmetry operation turns into each other. Kpoints rotate as M @ k, so n rotates
+as n @ M, and the star function S(k) = sum(cos(2 pi k.n)) / |star| has the symmetry
+of the lattice. Time reversal is assumed, so every star holds -n as well and the
+star functions are real.
+
+The fit goes exactly through the given values and has the least roughness, a
+penalty growing with |n|, among the ones that do. It takes more star functions than
+kpoints, `STAR_RATIO` times as many by default. The series is evaluated in chunks of
+kpoints, summed one crystal axis after the other with matrix products, or with one
+FFT per quantity on the meshes of `make_mesh`.
+"""
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+from dft_dummy.crystal_utils import reduce_lattice
+from dft_dummy.symmetry import find_symmetry_ops, to_crystal_ops, with_inversion
+
+STAR_RATIO = 5  # star functions per kpoint of the fit if not given
+_ROUGHNESS = (0.75, 0.75)  # c1 and c2 of the roughness of Pickett et al.
+
+
+class Stars(NamedTuple):
+    """stars of lattice vectors ordered by length, the origin first"""
+
+    points: np.ndarray  # Px3 integer lattice vectors in crystal coordinates
+    star: np.ndarray  # P indices of the stars of the points, ascending
+    counts: np.ndarray  # M number of points in every star
+    lengths: np.ndarray  # M lengths of the points of every star
+
+
+def _find_points(vec: np.ndarray, radius: float, tol: float) -> np.ndarray:
+    """all the lattice vectors no longer than `radius`, searched in the reduced
+    basis so that skewed bases do not blow up the search box"""
+    reduced, trans = reduce_lattice(vec, tol)
+    # n'_i = R . b_i with b_i the reciprocal vectors, so |n'_i| <= |b_i| radius
+    bounds = np.floor(radius * np.linalg.norm(np.linalg.inv(reduced), axis=0))
+    grid = np.meshgrid(*[np.arange(-b, b + 1) for b in bounds], indexing="ij")
+    points = np.stack(grid, axis=-1).reshape(-1, 3)
+    inside = np.linalg.norm(points @ reduced, axis=1) <= radius * (1 + tol)
+    return points[inside].astype(np.int64) @ trans
+
+
+def find_stars(
+    vec: np.ndarray, num_stars: int, ops: np.ndarray = None, tol: float = 1e-6
+) -> Stars:
+    """find the shortest stars of lattice vectors
+
+    Args:
+        vec (np.ndarray): 3x3 lattice basis vectors
+        num_stars (int): number of stars
+        ops (np.ndarray): Kx3x3 symmetry operations in the cartisian system, e.g.
+            the `point_group` of `spacegroup.find_space_group`, the inverted ones
+            are always added. Defaults to the ones of the lattice.
+        tol (float): numerical tolerance. Defaults to 1e-6.
+
+    Raises:
+        ValueError: an operation is not a valid one of the lattice
+
+    Returns:
+        Stars: the `num_stars` shortest stars
+    """
+    if num_stars <= 0:
+        raise ValueError("invalid number of stars")
+    vec = np.asarray(vec, dtype=float)
+    ops = find_symmetry_ops(vec, tol) if ops is None else np.asarray(ops, dtype=float)
+    ops_crys = np.unique(to_crystal_ops(with_inversion(ops), vec, tol), axis=0)
+    # a sphere holds about its volume over the cell volume lattice vectors, and a
+    # star at most as many as the operations
+    volume = abs(np.linalg.det(vec))
+    radius = np.cbrt(3 * volume * num_stars * len(ops_crys) / (4 * np.pi))
+    while True:
+        points = _find_points(vec, radius, tol)
+        images = np.rint(points.astype(float) @ ops_crys).astype(np.int64)
+        offset = np.abs(images).max()
+        base = 2 * offset + 1
+        keys = ((images[..., 0] + offset) * base + images[..., 1] + offset) * base
+        # every star is named by the largest key of its points
+        names, first, inverse = np.unique(
+            (keys + images[..., 2] + offset).max(axis=0),
+            return_index=True,
+            return_inverse=True,
+        )
+        if len(names) >= num_stars:
+            break
+        radius *= 1.5
+
+    lengths = np.linalg.norm(points[first] @ vec, axis=1)
+    order = np.lexsort((names, np.round(lengths / tol)))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    star = rank[inverse.ravel()]
+    kept = np.flatnonzero(star < num_stars)
+    kept = kept[np.argsort(star[kept], kind="stable")]
+    counts = np.bincount(star[kept], minlength=num_stars)
+    return Stars(points[kept], star[kept], counts, lengths[order[:num_stars]])
+
+
+def star_matrix(
+    kpts: np.ndarray, stars: Stars, chunk_size: int = 2 ** 22
+) -> np.ndarray:
+    """evaluate the star functions at kpoints
+
+    Args:
+        kpts (np.ndarray): Nx3 kpoints in crystal coordinates
+        stars (Stars): stars like from `find_stars`
+        chunk_size (int): number of phases computed at a time, kpoints times
+            points of the stars. Defaults to 2 ** 22.
+
+    Returns:
+        np.ndarray: NxM values of the M star functions
+    """
+    kpts = np.asarray(kpts, dtype=float).reshape(-1, 3)
+    points, star, weights = _half_points(stars)
+    # the points of a star are contiguous, and every star keeps at least one
+    starts = np.flatnonzero(np.diff(star, prepend=-1))
+    result = np.empty((len(kpts), len(stars.counts)))
+    step = max(chunk_size // len(points), 1)
+    for start in range(0, len(kpts), step):
+        phases = np.cos(2 * np.pi * kpts[start : start + step] @ points.T)
+        phases *= weights
+        result[start : start + step] = np.add.reduceat(phases, starts, axis=1)
+    return result
+
+
+def _roughness(lengths: np.ndarray) -> np.ndarray:
+    """roughness of star functions by their length, the shortest one has 1"""
+    c1, c2 = _ROUGHNESS
+    ratio = (lengths / lengths[0]) ** 2
+    return (1 - c1 * ratio) ** 2 + c2 * ratio ** 3
+
+
+def _half_points(stars: Stars) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """keep one of every n and -n, the one whose first non-zero element is
+    positive, their cosines are the same. Returns the points, their stars and
+    their weights in the star functions, twice one over the size of the star."""
+    signs = np.sign(stars.points)
+    kept = signs[np.arange(len(signs)), np.argmax(signs != 0, axis=1)] >= 0
+    star = stars.star[kept]
+    weights = np.where(stars.points[kept].any(axis=1), 2, 1) / stars.counts[star]
+    return stars.points[kept], star, weights
+
+
+class StarInterpolation(NamedTuple):
+    """a fitted series of star functions, see `fit_star_interpolation`"""
+
+    stars: Stars
+    coefs: np.ndarray  # MxB coefficients of the star functions, B quantities
+    points: np.ndarray  # Hx3 one of every n and -n of the stars
+    weights: np.ndarray  # HxB coefficients of cos(2 pi k.n) of the points
+
+    def evaluate(self, kpts: np.ndarray, chunk_size: int = 2 ** 22) -> np.ndarray:
+        """evaluate the series at kpoints, e.g. along a path. The sum over the
+        points is done one crystal axis after the other, as matrix products, with
+        the coefficients laid out on the box of the points.
+
+        Args:
+            kpts (np.ndarray): Nx3 kpoints in crystal coordinates
+            chunk_size (int): number of partial sums computed at a time, kpoints
+                times the area of the box. Defaults to 2 ** 22.
+
+        Returns:
+            np.ndarray: NxB interpolated quantities
+        """
+        kpts = np.asarray(kpts, dtype=float).reshape(-1, 3)
+        lowest = self.points.min(axis=0)
+        nx, ny, nz = self.points.max(axis=0) - lowest + 1
+        nbands = self.weights.shape[1]
+        box = np.zeros((nz, nx, ny, nbands))
+        ix, iy, iz = (self.points - lowest).T
+        box[iz, ix, iy] = self.weights
+        box = box.reshape(nz, -1)
+        result = np.empty((len(kpts), nbands))
+        step = max(chunk_size // (nx * ny * nbands), 1)
+        for start in range(0, len(kpts), step):
+            block = kpts[start : start + step]
+            phase_x, phase_y, phase_z = [
+                np.exp(2j * np.pi * np.outer(block[:, i], lowest[i] + np.arange(num)))
+                for i, num in enumerate((nx, ny, nz))
+            ]
+            sums = (phase_z @ box).reshape(-1, nx, ny, nbands)
+            sums = np.einsum("kxyb,ky->kxb", sums, phase_y)
+            result[start : start + step] = np.einsum("kxb,kx->kb", sums, phase_x).real
+        return result
+
+    def evaluate_mesh(
+        self,
+        nx: int,
+        ny: int,
+        nz: int,
+        dx: bool = False,
+        dy: bool = False,
+        dz: bool = False,
+    ) -> np.ndarray:
+        """evaluate the series on a mesh with one FFT per quantity, the points
+        of the stars are folded onto the mesh, so it can be coarser than them
+
+        Args:
+            nx, ny, nz, dx, dy, dz: same as `crystal_utils.make_mesh`
+
+        Returns:
+            np.ndarray: NxB interpolated quantities in the order of `make_mesh`
+        """
+        nums = np.array([nx, ny, nz])
+        if np.any(nums <= 0):
+            raise ValueError("invalid number of points")
+        # k = (j + d / 2) / n, so exp(2 pi i k.n) = exp(2 pi i j.n / n) shifted
+        shifts = np.exp(1j * np.pi * self.points @ (np.array([dx, dy, dz]) / nums))
+        grid = self.points % nums
+        flat = (grid[:, 0] * ny + grid[:, 1]) * nz + grid[:, 2]
+        result = np.empty((nx * ny * nz, self.weights.shape[1]))
+        for band, weights in enumerate(self.weights.T):
+            amps = weights * shifts
+            folded = np.bincount(flat, amps.real, nx * ny * nz)
+            folded = folded + 1j * np.bincount(flat, amps.imag, nx * ny * nz)
+            values = np.fft.ifftn(folded.reshape(nx, ny, nz)).real * len(result)
+            result[:, band] = values.transpose(1, 0, 2).ravel()
+        return result
+
+
+def fit_star_interpolation(
+    kpts: np.ndarray,
+    values: np.ndarray,
+    vec: np.ndarray,
+    num_stars: int = None,
+    ops: np.ndarray = None,
+    tol: float = 1e-6,
+) -> StarInterpolation:
+    """fit star functions to quantities of kpoints, e.g. the band energies of the
+    irreducible kpoints from `kpoints.find_irreducible_kpts`. The kpoints must not
+    be equivalent to each other.
+
+    Args:
+        kpts (np.ndarray): Nx3 kpoints in crystal coordinates
+        values (np.ndarray): N or NxB quantities of the kpoints
+        vec (np.ndarray): 3x3 lattice basis vectors
+        num_stars (int): number of star functions, at least N. Defaults to
+            `STAR_RATIO` times N.
+        ops, tol: same as `find_stars`
+
+    Raises:
+        ValueError: fewer star functions than kpoints
+
+    Returns:
+        StarInterpolation: the fitted series, it always evaluates to NxB
+    """
+    kpts = np.asarray(kpts, dtype=float).reshape(-1, 3)
+    values = np.asarray(values, dtype=float).reshape(len(kpts), -1)
+    num_stars = STAR_RATIO * len(kpts) if num_stars is None else num_stars
+    if num_stars < len(kpts):
+        raise ValueError("fewer star functions than kpoints")
+    stars = find_stars(vec, num_stars, ops, tol)
+    smat = star_matrix(kpts, stars)
+
+    # minimize sum(|c_m|^2 rho_m) with the series going through every value, the
+    # last kpoint is the reference that fixes the constant star
+    coefs = np.zeros((num_stars, values.shape[1]))
+    if len(kpts) > 1:
+        rho = _roughness(stars.lengths[1:])
+        dsmat = smat[:-1, 1:] - smat[-1, 1:]
+        hmat = (dsmat / rho) @ dsmat.T
+        lambdas = np.linalg.solve(hmat, values[:-1] - values[-1])
+        coefs[1:] = (dsmat.T @ lambdas) / rho[:, None]
+    coefs[0] = values[-1] - smat[-1, 1:] @ coefs[1:]
+    points, star, weights = _half_points(stars)
+    return StarInterpolation(stars, coefs, points, coefs[star] * weights[:, None])
@@ -1,55 +1,805 @@
-from typing import Tuple
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
 import numpy as np
-from scipy.sparse import csr_matrix
-from scipy.sparse.csgraph import connected_components
 
-from dft_dummy.crystal_utils import calc_reciprocal, project_points
+from dft_dummy.crystal_utils import (
+    calc_reciprocal,
+    compact_tol,
+    index_dtype,
+    mesh_flat_index,
+    mesh_grid,
+    mesh_points,
+    reduce_lattice,
+)
+from dft_dummy.stats import NULL_STATS, Stats
 from dft_dummy.symmetry import (
-    calc_overlap_matrix,
-    check_symmetry,
+    SymmetryMode,
+    apply_symmetry_mode,
+    check_symmetries,
     possible_unitary_rotations,
+    select_symmetry_ops,
+    to_crystal_ops,
 )
 
+# scipy is imported at first use only, it is slow to import and most of this
+# module, like `iter_irreducible_mesh`, does not need it
+if TYPE_CHECKING:  # pragma: no cover
+    from scipy.sparse import coo_matrix
+
+
+def wrap_points(pts: np.ndarray) -> np.ndarray:
+    """move points in crystal coordinates into the [0, 1) cell
+
+    Args:
+        pts (np.ndarray): Nx3 points in crystal coordinates
+
+    Returns:
+        np.ndarray: Nx3 points with every component in [0, 1)
+    """
+    return pts - np.floor(pts)
+
+
+def _within_tol(diff: np.ndarray, tol: float) -> np.ndarray:
+    """check that the rows of an Mx3 array have a norm below the tolerance,
+    without the temporaries of `np.linalg.norm` and in the dtype of `diff`"""
+    return np.einsum("ij,ij->i", diff, diff) < tol * tol
+
+
+def _find_mesh_shape(
+    kpts: np.ndarray, tol: float
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """detect if `kpts` is a complete uniform mesh like the ones from `make_mesh`
+
+    Returns:
+        Optional[Tuple[np.ndarray, np.ndarray]]: number of points and the offset
+            along each crystal axis, None if `kpts` is not such a mesh
+    """
+    nums = np.empty(3, dtype=int)
+    offsets = np.empty(3, dtype=kpts.dtype)
+    for axis in range(3):
+        # unique values along one axis, merged within the tolerance
+        values = np.sort(kpts[:, axis])
+        values = values[np.insert(np.diff(values) > tol, 0, True)]
+        nums[axis] = len(values)
+        offsets[axis] = values[0]
+    if np.prod(nums) != len(kpts) or np.any(offsets * nums >= 1 - tol):
+        return None
+    return nums, offsets
+
+
+class KptsIndex(NamedTuple):
+    """the arrays a kpoint lookup searches, see `make_kpts_index`. Only arrays, so
+    an index can be built once and shared with other processes."""
+
+    table: np.ndarray  # N kpoint indices, by flat mesh index or by sorted hash key
+    keys: np.ndarray  # N sorted hash keys, empty for a mesh
+    nums: np.ndarray  # number of points along each crystal axis, empty for a hash
+    offsets: np.ndarray  # offset along each crystal axis, empty for a hash
+
+
+def _flat_mesh_index(
+    rounded: np.ndarray, fnums: np.ndarray, dtype: np.dtype
+) -> np.ndarray:
+    grid = np.mod(rounded, fnums).astype(dtype)
+    ny, nz = int(fnums[1]), int(fnums[2])
+    return (grid[:, 0] * ny + grid[:, 1]) * nz + grid[:, 2]
+
+
+def _make_mesh_index(
+    kpts: np.ndarray, nums: np.ndarray, offsets: np.ndarray, tol: float
+) -> Optional[KptsIndex]:
+    """integer grid indexing: a point is located by its mesh indices directly"""
+    # all the float arithmetic stays in the dtype of the kpoints
+    fnums = nums.astype(kpts.dtype)
+    steps = (kpts - offsets) * fnums
+    rounded = np.rint(steps)
+    if np.any(np.abs(steps - rounded) > tol * fnums):
+        return None  # not evenly spaced
+    table = np.full(len(kpts), -1, dtype=index_dtype(len(kpts)))
+    table[_flat_mesh_index(rounded, fnums, table.dtype)] = np.arange(len(kpts))
+    if np.any(table < 0):
+        return None  # duplicated points
+    return KptsIndex(table, np.empty(0, dtype=np.int64), nums, offsets)
+
+
+def _make_mesh_lookup(
+    index: KptsIndex, tol: float
+) -> Callable[[np.ndarray], np.ndarray]:
+    table, offsets = index.table, index.offsets
+    fnums = index.nums.astype(offsets.dtype)
+
+    def lookup(pts: np.ndarray) -> np.ndarray:
+        steps = (wrap_points(pts) - offsets) * fnums
+        rounded = np.rint(steps)
+        steps -= rounded
+        steps /= fnums
+        found = _within_tol(steps, tol)
+        return np.where(found, table[_flat_mesh_index(rounded, fnums, table.dtype)], -1)
+
+    return lookup
+
+
+_CORNERS = np.array([[i, j, k] for i in (0, 1) for j in (0, 1) for k in (0, 1)])[1:]
+
+
+def _hash_size(tol: float) -> int:
+    return max(min(int(1 / (2 * tol)), 2 ** 21), 1)  # keys must fit into int64
+
+
+def _hash_keys(grid: np.ndarray, size: int) -> np.ndarray:
+    grid = grid % size
+    return (grid[:, 0] * size + grid[:, 1]) * size + grid[:, 2]
+
+
+def _make_hash_index(kpts: np.ndarray, tol: float) -> KptsIndex:
+    """rounded-key hash: every point is turned into one integer key on a grid
+    twice as coarse as the tolerance, keys are sorted once and searched afterwards"""
+    size = _hash_size(tol)
+    keys = _hash_keys(np.round(kpts * size).astype(np.int64), size)
+    order = np.argsort(keys, kind="stable").astype(index_dtype(len(kpts)))
+    nums, offsets = np.empty(0, dtype=int), np.empty(0, dtype=kpts.dtype)
+    return KptsIndex(order, keys[order], nums, offsets)
+
+
+def _make_hash_lookup(
+    kpts: np.ndarray, index: KptsIndex, tol: float
+) -> Callable[[np.ndarray], np.ndarray]:
+    """A point within the tolerance of a kpoint can only have a neighbouring key, on
+    the side of the kpoint, so points not found at first are searched again under
+    the keys of the neighbours on their side."""
+    size = _hash_size(tol)
+    order, sorted_keys = index.table, index.keys
+
+    def search(pts: np.ndarray, grid: np.ndarray) -> np.ndarray:
+        pos = np.searchsorted(sorted_keys, _hash_keys(grid, size))
+        pos[pos == len(sorted_keys)] = 0
+        idx = order[pos]
+        diff = pts - kpts[idx]
+        diff -= np.rint(diff)  # periodic distance
+        found = _within_tol(diff, tol)
+        return np.where(found, idx, -1)
+
+    def lookup(pts: np.ndarray) -> np.ndarray:
+        scaled = wrap_points(pts) * size
+        grid = np.round(scaled).astype(np.int64)
+        idx = search(pts, grid)
+        missing = np.flatnonzero(idx < 0)
+        if len(missing) == 0:
+            return idx
+        side = np.where(scaled[missing] >= grid[missing], 1, -1)
+        for corner in _CORNERS:
+            found = search(pts[missing], grid[missing] + side * corner)
+            idx[missing] = np.maximum(idx[missing], found)
+        return idx
+
+    return lookup
+
+
+def _search_dtype(kpts: np.ndarray) -> np.dtype:
+    return np.float32 if kpts.dtype == np.float32 else np.float64
+
+
+def make_kpts_index(kpts: np.ndarray, tol: float = 1e-6) -> KptsIndex:
+    """index kpoints for `make_index_lookup`, by their mesh indices if `kpts` is a
+    uniform mesh like the ones from `make_mesh` (in any order), by a rounded-key
+    hash otherwise
+
+    Args:
+        kpts (np.ndarray): Nx3 kpoints in crystal coordinates
+        tol (float): numerical tolerance, raised to `compact_tol` for float32.
+            Defaults to 1e-6.
+
+    Returns:
+        KptsIndex: arrays of the index
+    """
+    kpts = np.asarray(kpts)
+    dtype = _search_dtype(kpts)
+    kpts = wrap_points(kpts.astype(dtype, copy=False).reshape(-1, 3))
+    tol = compact_tol(tol, dtype)
+    mesh = _find_mesh_shape(kpts, tol)
+    index = _make_mesh_index(kpts, *mesh, tol) if mesh is not None else None
+    return _make_hash_index(kpts, tol) if index is None else index
+
+
+def make_index_lookup(
+    kpts: np.ndarray, index: KptsIndex, tol: float = 1e-6
+) -> Callable[[np.ndarray], np.ndarray]:
+    """same as `make_kpts_lookup` with an index that has been built already
+
+    Args:
+        kpts (np.ndarray): Nx3 kpoints in crystal coordinates
+        index (KptsIndex): index of `kpts` from `make_kpts_index` with the same `tol`
+        tol (float): numerical tolerance. Defaults to 1e-6.
+
+    Returns:
+        Callable[[np.ndarray], np.ndarray]: same as `make_kpts_lookup`
+    """
+    kpts = np.asarray(kpts)
+    dtype = _search_dtype(kpts)
+    tol = compact_tol(tol, dtype)
+    if len(index.nums):
+        return _make_mesh_lookup(index, tol)
+    kpts = kpts.astype(dtype, copy=False).reshape(-1, 3)
+    return _make_hash_lookup(kpts, index, tol)
+
+
+def make_kpts_lookup(
+    kpts: np.ndarray, tol: float = 1e-6
+) -> Callable[[np.ndarray], np.ndarray]:
+    """make a function that finds the index of points in the given kpoints list.
+    Points are wrapped into the [0, 1) cell before searching, so any periodic image
+    of a kpoint is found as well.
+
+    If `kpts` is a uniform mesh like the ones from `make_mesh` (in any order), the
+    index is computed from the mesh indices of a point, which is O(1). Otherwise,
+    a rounded-key hash of the points is searched, which is O(log N).
 
-def reduce_kpts(kpts: np.ndarray, vec: np.ndarray) -> Tuple[int, np.ndarray]:
+    float32 kpoints are searched in float32, anything else in float64. The indices
+    are int32 unless there are too many kpoints for it, see `index_dtype`.
+
+    Args:
+        kpts (np.ndarray): Nx3 kpoints in crystal coordinates
+        tol (float): numerical tolerance, raised to `compact_tol` for float32.
+            Defaults to 1e-6.
+
+    Returns:
+        Callable[[np.ndarray], np.ndarray]: function mapping Mx3 points to their
+            M indices in `kpts`, -1 for points that are not found
+    """
+    return make_index_lookup(kpts, make_kpts_index(kpts, tol), tol)
+
+
+def rotate_points(ops_crys: np.ndarray, pts: np.ndarray) -> np.ndarray:
+    """apply a stack of operations in crystal coordinates to a list of points.
+    Every element is summed in the same order, no matter how many points there are,
+    so rotating a list in pieces gives identical results.
+
+    Args:
+        ops_crys (np.ndarray): Kx3x3 operations in crystal coordinates
+        pts (np.ndarray): Nx3 points in crystal coordinates
+
+    Returns:
+        np.ndarray: KxNx3 rotated points
+    """
+    rotated = ops_crys[:, None, :, 0] * pts[None, :, 0, None]
+    rotated += ops_crys[:, None, :, 1] * pts[None, :, 1, None]
+    rotated += ops_crys[:, None, :, 2] * pts[None, :, 2, None]
+    return rotated
+
+
+def find_kpts_images(
+    kpts: np.ndarray,
+    vec: np.ndarray,
+    ops: np.ndarray,
+    tol: float = 1e-6,
+    workers: int = 1,
+    stats: Stats = None,
+    dtype: np.dtype = np.float64,
+) -> np.ndarray:
+    """apply a stack of symmetry operations to all kpoints at once and find the
+    index of every rotated kpoint in the original list
+
+    Args:
+        kpts (np.ndarray): Nx3 kpoints in crystal coordinates
+        vec (np.ndarray): 3x3 lattice basis vectors
+        ops (np.ndarray): Kx3x3 symmetry operations in the cartisian system
+        tol (float): numerical tolerance. Defaults to 1e-6.
+        workers (int): number of processes, None for as many as CPUs. The kpoints
+            are split into shards for them, see `parallel`. Defaults to 1.
+        stats (Stats): instrumentation, see `stats`. Defaults to None.
+        dtype (np.dtype): float type the kpoints are rotated and searched in,
+            np.float32 halves the memory and bandwidth of large meshes, with the
+            tolerance raised to `compact_tol`. Defaults to np.float64.
+
+    Returns:
+        np.ndarray: KxN indices of the rotated kpoints, -1 if not found in `kpts`,
+            int32 unless there are too many kpoints for it
+    """
+    try:
+        # exact integers, found in the reduced basis of the lattice
+        ops_crys = to_crystal_ops(ops, vec, tol)
+    except ValueError:
+        # not all of them are operations of the lattice, rotate them as they are:
+        # crystal -> cartisian, rotate, then back to crystal, as one matrix per op
+        rvec = calc_reciprocal(vec)
+        ops_crys = np.einsum("ij,ojk,kl->oil", vec, ops, rvec)
+    return find_kpts_images_crys(kpts, ops_crys, tol, workers, stats, dtype)
+
+
+def find_kpts_images_crys(
+    kpts: np.ndarray,
+    ops_crys: np.ndarray,
+    tol: float = 1e-6,
+    workers: int = 1,
+    stats: Stats = None,
+    dtype: np.dtype = np.float64,
+) -> np.ndarray:
+    """same as `find_kpts_images` but the symmetry operations are given in
+    crystal coordinates, see `symmetry.to_crystal_ops`
+
+    Args:
+        kpts (np.ndarray): Nx3 kpoints in crystal coordinates
+        ops_crys (np.ndarray): Kx3x3 symmetry operations in crystal coordinates
+        tol, workers, stats, dtype: same as `find_kpts_images`
+
+    Returns:
+        np.ndarray: KxN indices of the rotated kpoints, -1 if not found in `kpts`
+    """
+    stats = stats or NULL_STATS
+    kpts = np.asarray(kpts, dtype=dtype).reshape(-1, 3)
+    ops_crys = np.asarray(ops_crys, dtype=dtype)
+    if workers != 1:
+        from dft_dummy.parallel import find_kpts_images_parallel
+
+        with stats.phase("images"):
+            images = find_kpts_images_parallel(kpts, ops_crys, tol, workers)
+    else:
+        with stats.phase("lookup_build"):
+            lookup = make_kpts_lookup(kpts, tol)
+        with stats.phase("rotate"):
+            krot_crys = rotate_points(ops_crys, kpts)
+        stats.peak("rotated", krot_crys)
+        with stats.phase("lookup"):
+            images = lookup(krot_crys.reshape(-1, 3)).reshape(len(ops_crys), -1)
+    stats.peak("images", images)
+    if stats.enabled:
+        stats.count("unmatched", np.count_nonzero(images < 0))
+    return images
+
+
+def find_mesh_images(
+    ops_crys: np.ndarray,
+    nums: Tuple[int, int, int],
+    shifts: Tuple[bool, bool, bool] = (False, False, False),
+    index: np.ndarray = None,
+) -> np.ndarray:
+    """same as `find_kpts_images` for the mesh from `make_mesh`, but in integer
+    arithmetic only, so no tolerance is involved.
+
+    A mesh point is written as k_b = g_b / (2 n_b), where g_b = 2 i_b + s_b is its
+    doubled (to include the half step offsets) integer index along axis b. An
+    integer operation M turns it into 2 n_a k'_a = sum_b M_ab n_a g_b / n_b, which
+    is on the mesh only if it is an integer with the parity of s_a. With L the least
+    common multiple of the n's, everything is computed on integers scaled by L.
+
+    Args:
+        ops_crys (np.ndarray): Kx3x3 integer operations in crystal coordinates,
+            see `symmetry.to_crystal_ops`
+        nums (Tuple[int, int, int]): number of points along each crystal axis
+        shifts (Tuple[bool, bool, bool]): half step offsets along each crystal axis
+        index (np.ndarray): M indices of the mesh points to rotate.
+            Defaults to None, all the mesh points.
+
+    Returns:
+        np.ndarray: KxM indices of the rotated mesh points, -1 if off the mesh
+    """
+    nums = np.asarray(nums, dtype=np.int64)
+    shifts = np.asarray(shifts, dtype=np.int64)
+    if index is None:
+        index = np.arange(np.prod(nums))
+    lcm = np.lcm.reduce(nums)
+    ops_crys = np.asarray(ops_crys, dtype=np.int64)
+    # integers stay below 6 n L max|M|, use int32 whenever it is safe
+    bound = 6 * nums.max() * lcm * max(np.abs(ops_crys).max(), 1)
+    dtype = np.int32 if bound < np.iinfo(np.int32).max else np.int64
+
+    grid = mesh_grid(np.asarray(index), *nums)
+    scaled = ((2 * grid + shifts[:, None]) * (lcm // nums)[:, None]).astype(dtype)
+    # K x 3 x M, the rotated doubled indices scaled by L / n_a
+    rotated = (ops_crys * nums[:, None]).astype(dtype) @ scaled
+    doubled, remainder = np.divmod(rotated, dtype(lcm))
+    on_mesh = np.all((remainder == 0) & ((doubled - shifts[:, None]) % 2 == 0), axis=1)
+    images = mesh_flat_index(np.moveaxis(doubled // 2, 1, 0), *nums)
+    return np.where(on_mesh, images, -1)
+
+
+def make_graph_matrix(images: np.ndarray) -> "coo_matrix":
+    """make the equivalence graph of kpoints, an edge (i, j) means kpoint i is
+    turned into kpoint j by some symmetry operation. The edges are collected in
+    index arrays and the sparse matrix is built once from them.
+
+    Args:
+        images (np.ndarray): KxN indices of the rotated kpoints like the ones
+            from `find_kpts_images`, -1 if not found
+
+    Returns:
+        coo_matrix: NxN adjacency matrix
+    """
+    from scipy.sparse import coo_matrix
+
+    nkpts = images.shape[-1]
+    found = images >= 0
+    rows = np.broadcast_to(np.arange(nkpts, dtype=images.dtype), images.shape)
+    rows, cols = rows[found], images[found]
+    data = np.ones(len(rows), dtype=np.uint8)
+    return coo_matrix((data, (rows, cols)), shape=(nkpts, nkpts))
+
+
+def find_valid_ops(
+    vec: np.ndarray, tol: float = 1e-6, stats: Stats = None
+) -> np.ndarray:
+    """find the symmetry operations of a lattice together with their inverse
+
+    Args:
+        vec (np.ndarray): 3x3 lattice basis vectors
+        tol (float): numerical tolerance. Defaults to 1e-6.
+        stats (Stats): instrumentation, see `stats`. Defaults to None.
+
+    Returns:
+        np.ndarray: Kx3x3 symmetry operations in the cartisian system
+    """
+    return select_symmetry_ops(vec, SymmetryMode.full, tol, stats)
+
+
+def _select_ops(
+    vec: np.ndarray, ops: np.ndarray, mode: SymmetryMode, tol: float, stats: Stats
+) -> np.ndarray:
+    if ops is not None:
+        ops = np.asarray(ops, dtype=float).reshape(-1, 3, 3)
+        # weights and the ops of the irreducible kpoints count on the identity
+        if not np.any(np.all(np.abs(ops - np.eye(3)) < tol, axis=(1, 2))):
+            ops = np.concatenate((np.eye(3)[None], ops))
+        return ops
+    return select_symmetry_ops(vec, mode, tol, stats)
+
+
+def find_components(images: np.ndarray, stats: Stats = None) -> Tuple[int, np.ndarray]:
+    """label the kpoints by the connected components of their equivalence graph
+
+    Args:
+        images (np.ndarray): KxN indices of the rotated kpoints like the ones
+            from `find_kpts_images`, -1 if not found
+        stats (Stats): instrumentation, see `stats`. Defaults to None.
+
+    Returns:
+        Tuple[int, np.ndarray]: number of components and the N labels
+    """
+    from scipy.sparse.csgraph import connected_components
+
+    stats = stats or NULL_STATS
+    with stats.phase("graph"):
+        graph_matrix = make_graph_matrix(images)
+    stats.count("edges", graph_matrix.nnz)
+
+    with stats.phase("components"):
+        return connected_components(
+            csgraph=graph_matrix, directed=False, return_labels=True
+        )
+
+
+def reduce_kpts(
+    kpts: np.ndarray,
+    vec: np.ndarray,
+    tol: float = 1e-6,
+    workers: int = 1,
+    stats: Stats = None,
+    mode: SymmetryMode = SymmetryMode.full,
+    ops: np.ndarray = None,
+    dtype: np.dtype = np.float64,
+) -> Tuple[int, np.ndarray]:
     """reduce kpoints to the irreducible ones
 
     Args:
         kpts (np.ndarray): Nx3 kmesh in the 1st Brillouin Zone in crystal coordinates
         vec (np.ndarray): 3x3 lattice basis vectors
+        tol (float): numerical tolerance. Defaults to 1e-6.
+        workers (int): number of processes, None for as many as CPUs.
+            Defaults to 1.
+        stats (Stats): instrumentation, see `stats`. Defaults to None.
+        mode (SymmetryMode): which symmetry operations of the lattice to reduce
+            with. Defaults to SymmetryMode.full.
+        ops (np.ndarray): Kx3x3 symmetry operations in the cartisian system to
+            reduce with instead of the ones chosen by `mode`, the identity is
+            added if missing. Defaults to None.
+        dtype (np.dtype): float type the kpoints are rotated and searched in, see
+            `find_kpts_images`. The symmetry detection is always done in float64.
+            Defaults to np.float64.
 
     Returns:
         Tuple[int, np.ndarray]: number of irreducible kpoints and
             label array that maps the `kpts` to each (irreducible) kind.
     """
-    overlap = calc_overlap_matrix(vec)
-    symmetry_ops = possible_unitary_rotations()
-    valid_ops = [
-        (i, sym)
-        for i, sym in enumerate(symmetry_ops)
-        if check_symmetry(sym, vec, overlap)
-    ]
-
-    rvec = calc_reciprocal(vec)
-    nkpts = len(kpts)
-
-    def update_graph_matrix(sym, kcart):
-        krot = sym.dot(kcart)  # rotated in cartisian system
-        krot_crys = vec.dot(krot)  # back to crystal system
-        krot_crys_moved = krot_crys - np.floor(krot_crys)  # move to the 1st BZ
-        # find the index of the moved point in the original mesh
-        norms = np.linalg.norm(kpts - krot_crys_moved, axis=1)
-        idx = np.arange(len(norms))[norms < 1e-6]
-        graph_matrix[i, idx] = 1
-
-    graph_matrix = csr_matrix((nkpts, nkpts), dtype=int)
-    for i, kcrys in enumerate(kpts):
-        kcart = project_points(rvec, kcrys).ravel()  # flatten as it is one point
-        for _, sym in valid_ops:
-            update_graph_matrix(sym, kcart)
-            update_graph_matrix(-sym, kcart)  # inverse symmetry
-
-    return connected_components(
-        csgraph=graph_matrix, directed=False, return_labels=True
-    )
+    ops = _select_ops(vec, ops, mode, tol, stats)
+    images = find_kpts_images(kpts, vec, ops, tol, workers, stats, dtype)
+    return find_components(images, stats)
+
+
+def reduce_mesh(
+    vec: np.ndarray,
+    nx: int,
+    ny: int,
+    nz: int,
+    dx: bool = False,
+    dy: bool = False,
+    dz: bool = False,
+    tol: float = 1e-6,
+    stats: Stats = None,
+    mode: SymmetryMode = SymmetryMode.full,
+    ops: np.ndarray = None,
+) -> Tuple[int, np.ndarray]:
+    """same as `reduce_kpts(make_mesh(nx, ny, nz, dx, dy, dz), vec)` but exact and
+    faster, the symmetry operations act on integer mesh indices directly, see
+    `find_mesh_images`. The mesh itself is never made.
+
+    Args:
+        vec (np.ndarray): 3x3 lattice basis vectors
+        nx, ny, nz, dx, dy, dz: same as `make_mesh`
+        tol (float): numerical tolerance of the symmetry detection.
+            Defaults to 1e-6.
+        stats (Stats): instrumentation, see `stats`. Defaults to None.
+        mode, ops: same as `reduce_kpts`
+
+    Returns:
+        Tuple[int, np.ndarray]: number of irreducible kpoints and
+            label array that maps the mesh to each (irreducible) kind.
+    """
+    stats = stats or NULL_STATS
+    ops_crys = to_crystal_ops(_select_ops(vec, ops, mode, tol, stats), vec, tol)
+    with stats.phase("images"):
+        images = find_mesh_images(ops_crys, (nx, ny, nz), (dx, dy, dz))
+    stats.peak("images", images)
+    if stats.enabled:
+        stats.count("unmatched", np.count_nonzero(images < 0))
+    return find_components(images, stats)
+
+
+def embed_mesh(
+    old_nums: Tuple[int, int, int],
+    old_shifts: Tuple[bool, bool, bool],
+    nums: Tuple[int, int, int],
+    shifts: Tuple[bool, bool, bool],
+) -> np.ndarray:
+    """find the indices of the points of a coarse mesh in a finer one, both from
+    `make_mesh`. The fine mesh contains the coarse one if it has a multiple m of
+    the points along every axis, and the offsets fit, i.e. a half step offset of
+    the coarse mesh is a half step offset of the fine one for odd m and no offset
+    for even m.
+
+    Args:
+        old_nums, old_shifts: numbers of points and offsets of the coarse mesh
+        nums, shifts: numbers of points and offsets of the fine mesh
+
+    Raises:
+        ValueError: the fine mesh does not contain the coarse one
+
+    Returns:
+        np.ndarray: indices of the coarse mesh points in the fine mesh
+    """
+    old_nums, nums = np.asarray(old_nums), np.asarray(nums)
+    old_shifts = np.asarray(old_shifts, dtype=int)
+    shifts = np.asarray(shifts, dtype=int)
+    multiples, remainder = np.divmod(nums, old_nums)
+    if np.any(remainder) or np.any(old_shifts * multiples % 2 != shifts):
+        raise ValueError("the mesh does not contain the old mesh")
+    # doubled indices, see `find_mesh_images`
+    doubled = 2 * mesh_grid(np.arange(np.prod(old_nums)), *old_nums).T + old_shifts
+    grid = (doubled * multiples - shifts) // 2
+    return mesh_flat_index(grid.T, *nums)
+
+
+def refine_mesh(
+    vec: np.ndarray,
+    old_labels: np.ndarray,
+    old_nums: Tuple[int, int, int],
+    old_shifts: Tuple[bool, bool, bool],
+    nums: Tuple[int, int, int],
+    shifts: Tuple[bool, bool, bool] = (False, False, False),
+    tol: float = 1e-6,
+    stats: Stats = None,
+    mode: SymmetryMode = SymmetryMode.full,
+    ops: np.ndarray = None,
+) -> Tuple[int, np.ndarray]:
+    """same as `reduce_mesh(vec, *nums, *shifts)`, but reuses the labels of a
+    coarser mesh the new one contains (see `embed_mesh`), e.g. during kpoint
+    convergence tests. Only the new mesh points are rotated.
+
+    The old points are linked to the first old point of their kind and the new
+    points to all of their images, which may be old points. A new point can be
+    equivalent to an old one, e.g. (1/4, 0, 0) of a cubic (4, 8, 8) mesh to
+    (0, 1/4, 0) of the old (2, 4, 4) one, and old kinds can be merged through new
+    points, so the kinds are found over the whole graph and numbered as in
+    `reduce_mesh`.
+
+    Args:
+        vec (np.ndarray): 3x3 lattice basis vectors
+        old_labels (np.ndarray): labels of the old mesh from `reduce_mesh`
+        old_nums, old_shifts: numbers of points and offsets of the old mesh
+        nums, shifts: numbers of points and offsets of the new mesh
+        tol, stats, mode, ops: same as `reduce_mesh`
+
+    Returns:
+        Tuple[int, np.ndarray]: number of irreducible kpoints and
+            label array that maps the new mesh to each (irreducible) kind.
+    """
+    stats = stats or NULL_STATS
+    npts = int(np.prod(nums))
+    old_index = embed_mesh(old_nums, old_shifts, nums, shifts)
+    new_index = np.ones(npts, dtype=bool)
+    new_index[old_index] = False
+    new_index = np.flatnonzero(new_index)
+
+    ops_crys = to_crystal_ops(_select_ops(vec, ops, mode, tol, stats), vec, tol)
+    with stats.phase("images"):
+        images = find_mesh_images(ops_crys, nums, shifts, new_index)
+    # an image array over the new mesh: new points point to their images and the
+    # old points to the first old point of their kind
+    old_labels = np.asarray(old_labels)
+    _, first = np.unique(old_labels, return_index=True)
+    full_images = np.full((len(ops_crys), npts), -1, dtype=images.dtype)
+    full_images[:, new_index] = images
+    full_images[0, old_index] = old_index[first[old_labels]]
+    return find_components(full_images, stats)
+
+
+def iter_irreducible_mesh(
+    vec: np.ndarray,
+    nx: int,
+    ny: int,
+    nz: int,
+    dx: bool = False,
+    dy: bool = False,
+    dz: bool = False,
+    tol: float = 1e-6,
+    chunk_size: int = 65536,
+    mode: SymmetryMode = SymmetryMode.full,
+    ops: np.ndarray = None,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """enumerate the irreducible kpoints of the mesh from `make_mesh` and their
+    weights without making the mesh or its equivalence graph, so the memory is
+    bounded by the chunk size and the number of irreducible kpoints.
+
+    Mesh indices are walked in order, chunk by chunk. A mesh point is irreducible
+    if none of its symmetry images has a lower index, and its weight is the number
+    of its distinct images. The irreducible kpoints are the same, in the same order,
+    as the first kpoint of every kind from `reduce_mesh`, as long as the operations
+    map the mesh onto itself.
+
+    Args:
+        vec (np.ndarray): 3x3 lattice basis vectors
+        nx, ny, nz, dx, dy, dz: same as `make_mesh`
+        tol (float): numerical tolerance of the symmetry detection.
+            Defaults to 1e-6.
+        chunk_size (int): number of mesh points checked at a time.
+            Defaults to 65536.
+        mode, ops: same as `reduce_kpts`
+
+    Yields:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: mesh indices, Mx3 kpoints in
+            crystal coordinates and integer weights of the irreducible kpoints
+    """
+    if chunk_size <= 0:
+        raise ValueError("invalid chunk size")
+    ops_crys = to_crystal_ops(_select_ops(vec, ops, mode, tol, None), vec, tol)
+    nums, shifts = (nx, ny, nz), (dx, dy, dz)
+    npts = nx * ny * nz
+    for start in range(0, npts, chunk_size):
+        index = np.arange(start, min(start + chunk_size, npts))
+        images = find_mesh_images(ops_crys, nums, shifts, index)
+        images[images < 0] = npts  # off the mesh, never lower
+        irreducible = np.all(images >= index, axis=0)
+        index, images = index[irreducible], np.sort(images[:, irreducible], axis=0)
+        # distinct images on the mesh, the point itself included
+        distinct = (images[1:] != images[:-1]) & (images[1:] < npts)
+        weights = np.count_nonzero(distinct, axis=0) + (images[0] < npts)
+        yield index, mesh_points(index, *nums, *shifts), weights
+
+
+def reduce_kpts_batch(
+    kpts: np.ndarray,
+    vecs: np.ndarray,
+    tol: float = 1e-6,
+    workers: int = 1,
+    stats: Stats = None,
+    mode: SymmetryMode = SymmetryMode.full,
+    dtype: np.dtype = np.float64,
+) -> List[Tuple[int, np.ndarray]]:
+    """same as `reduce_kpts` for many lattices sharing one kmesh. The reduction
+    only depends on the symmetry operations in crystal coordinates, so lattices
+    are grouped by them (e.g. by point group, for lattices in the same setting)
+    and every group is reduced once.
+
+    Args:
+        kpts (np.ndarray): Nx3 kmesh in the 1st Brillouin Zone in crystal coordinates
+        vecs (np.ndarray): Mx3x3 lattice basis vectors
+        tol, workers, stats, mode, dtype: same as `reduce_kpts`
+
+    Returns:
+        List[Tuple[int, np.ndarray]]: number of irreducible kpoints and labels of
+            every lattice, lattices of the same group share the same labels array
+    """
+    stats = stats or NULL_STATS
+    vecs = np.asarray(vecs, dtype=float).reshape(-1, 3, 3)
+    symms = possible_unitary_rotations()
+    with stats.phase("symmetry"):
+        reduced = np.array([reduce_lattice(vec, tol)[0] for vec in vecs])
+        valid = check_symmetries(symms, reduced, tol=tol)
+    results: Dict[bytes, Tuple[int, np.ndarray]] = {}
+    batch = []
+    for vec, mask in zip(vecs, valid):
+        ops_crys = to_crystal_ops(apply_symmetry_mode(symms[mask], mode), vec, tol)
+        key = ops_crys.tobytes()
+        if key not in results:
+            stats.count("groups")
+            images = find_kpts_images_crys(kpts, ops_crys, tol, workers, stats, dtype)
+            results[key] = find_components(images, stats)
+        batch.append(results[key])
+    return batch
+
+
+class IrreducibleKpts(NamedTuple):
+    """irreducible kpoints of a kmesh and how they unfold onto the full mesh"""
+
+    kpts: np.ndarray  # Mx3 irreducible kpoints in crystal coordinates
+    index: np.ndarray  # M indices of the irreducible kpoints in the full mesh
+    weights: np.ndarray  # M integer multiplicities, sum up to N
+    labels: np.ndarray  # N labels that map the full mesh to the irreducible kpoints
+    ops: np.ndarray  # Kx3x3 symmetry operations in the cartisian system
+    # N indices of the ops that turn a kpoint into its kind, -1 if none does, which
+    # can only happen if the ops are not a group
+    op_index: np.ndarray
+
+    @property
+    def normalized_weights(self) -> np.ndarray:
+        """weights of the irreducible kpoints that sum up to one"""
+        return self.weights / len(self.labels)
+
+    def unfold(self, values: np.ndarray) -> np.ndarray:
+        """unfold quantities of the irreducible kpoints onto the full mesh
+
+        Args:
+            values (np.ndarray): quantities with M irreducible kpoints on axis 0
+
+        Returns:
+            np.ndarray: quantities with N kpoints on axis 0
+        """
+        return np.asarray(values)[self.labels]
+
+
+def find_irreducible_kpts(
+    kpts: np.ndarray,
+    vec: np.ndarray,
+    tol: float = 1e-6,
+    workers: int = 1,
+    stats: Stats = None,
+    mode: SymmetryMode = SymmetryMode.full,
+    ops: np.ndarray = None,
+    dtype: np.dtype = np.float64,
+) -> IrreducibleKpts:
+    """reduce kpoints to the irreducible ones, like `reduce_kpts`, but also find
+    the weights of the irreducible kpoints and the symmetry operations that turn
+    every kpoint into its irreducible kind. The first kpoint of every kind is
+    taken as the irreducible one.
+
+    Args:
+        kpts (np.ndarray): Nx3 kmesh in the 1st Brillouin Zone in crystal coordinates
+        vec (np.ndarray): 3x3 lattice basis vectors
+        tol (float): numerical tolerance. Defaults to 1e-6.
+        workers (int): number of processes, None for as many as CPUs.
+            Defaults to 1.
+        stats (Stats): instrumentation, see `stats`. Defaults to None.
+        mode, ops, dtype: same as `reduce_kpts`
+
+    Returns:
+        IrreducibleKpts: the irreducible kpoints, in `dtype`
+    """
+    kpts = np.asarray(kpts, dtype=dtype).reshape(-1, 3)
+    ops = _select_ops(vec, ops, mode, tol, stats)
+    images = find_kpts_images(kpts, vec, ops, tol, workers, stats, dtype)
+    _, labels = find_components(images, stats)
+    # labels are numbered in order of first appearance
+    _, index, weights = np.unique(labels, return_index=True, return_counts=True)
+
+    # the first op that turns a kpoint into its irreducible kpoint
+    matched = images == index[labels]
+    op_index = np.where(matched.any(axis=0), matched.argmax(axis=0), -1)
+
+    return IrreducibleKpts(kpts[index], index, weights, labels, ops, op_index)
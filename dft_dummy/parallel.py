@@ -0,0 +1,152 @@
+"""Parallel kpoint reduction over a process pool.
+
+The kpoints are split into contiguous shards, one task per shard. Every worker
+rotates the kpoints of its shard with all the symmetry operations and writes the
+indices of the rotated kpoints into its own columns of a KxN array. The index of
+the kpoints, see `kpoints.make_kpts_index`, is built once by the parent. The
+kpoints, the arrays of their index and the indices of the rotated kpoints live in
+shared memory, so nothing large is pickled or built again by every worker. The
+equivalence classes of all shards are merged afterwards by building one graph
+from the full array of indices, as in the serial reduction.
+
+Each kpoint is rotated and looked up exactly as in `find_kpts_images`, so the
+indices, and the labels derived from them, are identical to the serial ones no
+matter how many workers are used.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Tuple
+
+import numpy as np
+
+from dft_dummy.crystal_utils import index_dtype
+from dft_dummy.kpoints import (
+    KptsIndex,
+    make_index_lookup,
+    make_kpts_index,
+    rotate_points,
+)
+
+# shared memory name, then offset, shape and dtype of every array in it
+_ArraysDesc = Tuple[str, List[Tuple[int, Tuple[int, ...], str]]]
+_ALIGN = 64
+
+
+def _create(
+    specs: List[Tuple[Tuple[int, ...], np.dtype]]
+) -> Tuple[SharedMemory, _ArraysDesc]:
+    """one new block of shared memory for arrays of the given shapes and dtypes,
+    each aligned to 64 bytes"""
+    descs, offset = [], 0
+    for shape, dtype in specs:
+        dtype = np.dtype(dtype)
+        descs.append((offset, tuple(shape), dtype.str))
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        offset += -(-nbytes // _ALIGN) * _ALIGN
+    shm = SharedMemory(create=True, size=max(offset, 1))
+    return shm, (shm.name, descs)
+
+
+def _share(arrays: List[np.ndarray]) -> Tuple[SharedMemory, _ArraysDesc]:
+    """copy arrays into one new block of shared memory"""
+    shm, desc = _create([(arr.shape, arr.dtype) for arr in arrays])
+    for arr, arr_desc in zip(arrays, desc[1]):
+        _view(shm, arr_desc)[...] = arr
+    return shm, desc
+
+
+def _view(shm: SharedMemory, desc: Tuple[int, Tuple[int, ...], str]) -> np.ndarray:
+    offset, shape, dtype = desc
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+
+
+def _attach(desc: _ArraysDesc) -> Tuple[SharedMemory, List[np.ndarray]]:
+    name, descs = desc
+    shm = SharedMemory(name=name)
+    return shm, [_view(shm, arr_desc) for arr_desc in descs]
+
+
+def _find_shard_images(
+    kpts_desc: _ArraysDesc,
+    mesh: Tuple[np.ndarray, np.ndarray],
+    images_desc: _ArraysDesc,
+    ops_crys: np.ndarray,
+    tol: float,
+    start: int,
+    stop: int,
+):
+    """worker task: fill in the indices of the rotated kpoints start:stop"""
+    kpts_shm, (kpts, table, keys) = _attach(kpts_desc)
+    images_shm, (images,) = _attach(images_desc)
+    lookup = None
+    try:
+        lookup = make_index_lookup(kpts, KptsIndex(table, keys, *mesh), tol)
+        krot_crys = rotate_points(ops_crys, kpts[start:stop])
+        images[:, start:stop] = lookup(krot_crys.reshape(-1, 3)).reshape(
+            len(ops_crys), stop - start
+        )
+    finally:
+        # views, also the ones held by the lookup, must be released before closing
+        del kpts, table, keys, images, lookup
+        kpts_shm.close()
+        images_shm.close()
+
+
+def find_kpts_images_parallel(
+    kpts: np.ndarray, ops_crys: np.ndarray, tol: float = 1e-6, workers: int = None
+) -> np.ndarray:
+    """same as `find_kpts_images` but the kpoints are sharded over a process pool
+
+    Args:
+        kpts (np.ndarray): Nx3 kpoints in crystal coordinates, float32 kpoints
+            are shared and searched in float32
+        ops_crys (np.ndarray): Kx3x3 symmetry operations in crystal coordinates
+        tol (float): numerical tolerance. Defaults to 1e-6.
+        workers (int): number of processes, None for as many as CPUs.
+            Defaults to None.
+
+    Returns:
+        np.ndarray: KxN indices of the rotated kpoints, -1 if not found in `kpts`
+    """
+    workers = workers or os.cpu_count()
+    if workers <= 0:
+        raise ValueError("invalid number of workers")
+    kpts = np.asarray(kpts)
+    dtype = np.float32 if kpts.dtype == np.float32 else np.float64
+    kpts = np.ascontiguousarray(kpts, dtype=dtype)
+    nkpts = len(kpts)
+    images_shape = (len(ops_crys), nkpts)
+    images_dtype = index_dtype(nkpts)
+
+    # the lookup is built once here, its large arrays are shared with the kpoints
+    index = make_kpts_index(kpts, tol)
+    kpts_shm, kpts_desc = _share([kpts, index.table, index.keys])
+    images_shm, images_desc = _create([(images_shape, images_dtype)])
+    mesh = (index.nums, index.offsets)
+    try:
+        bounds = np.linspace(0, nkpts, min(workers, max(nkpts, 1)) + 1).astype(int)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            tasks = [
+                pool.submit(
+                    _find_shard_images,
+                    kpts_desc,
+                    mesh,
+                    images_desc,
+                    ops_crys,
+                    tol,
+                    *shard,
+                )
+                for shard in zip(bounds[:-1], bounds[1:])
+            ]
+            for task in tasks:
+                task.result()  # raise errors from the workers
+        images = _view(images_shm, images_desc[1][0])
+        result = images.copy()
+        del images
+        return result
+    finally:
+        kpts_shm.close()
+        kpts_shm.unlink()
+        images_shm.close()
+        images_shm.unlink()
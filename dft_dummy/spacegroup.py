@@ -0,0 +1,158 @@
+"""Space groups of crystals: the symmetry operations of the lattice that also map
+every atom onto an atom of the same species, each with a fractional translation.
+
+An operation maps fractional coordinates x, as rows, to x @ W + t, where W is an
+integer matrix (see `symmetry.to_crystal_ops`) and t a translation in [0, 1). The
+candidate translations of W map the first atom of the rarest species onto any atom
+of that species. They are checked with a few atoms first, then with more and more
+of them, and the atoms are searched in the hashed index of `make_kpts_lookup`, so
+matching costs O(N log N) per candidate at most instead of O(N^2).
+
+The valid translations of W are a coset of the pure translations, the ones of the
+identity, e.g. the lattice points of a supercell. So only the pure translations
+and one translation of every other W are checked with all the atoms.
+"""
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from dft_dummy.kpoints import make_kpts_lookup, wrap_points
+from dft_dummy.symmetry import find_symmetry_ops, to_crystal_ops, with_inversion
+
+_FIRST_BLOCK = 16  # atoms the candidate translations are checked with first
+
+
+class SpaceGroup(NamedTuple):
+    """symmetry operations of a crystal, x -> x @ rotations[i] + translations[i]"""
+
+    rotations: np.ndarray  # Kx3x3 integer matrices acting on fractional coordinates
+    translations: np.ndarray  # Kx3 fractional translations in [0, 1)
+    # Kx3x3 the same rotations in the cartisian system, acting on column vectors,
+    # i.e. x @ rotations[i] == x @ vec @ ops[i].T @ inv(vec)
+    ops: np.ndarray
+
+    @property
+    def point_group(self) -> np.ndarray:
+        """distinct rotations in the cartisian system, e.g. to reduce kpoints with
+        as the `ops` of `reduce_kpts`, after `symmetry.with_inversion` for time
+        reversal"""
+        flat = self.rotations.reshape(len(self.rotations), -1)
+        _, index = np.unique(flat, axis=0, return_index=True)
+        return self.ops[np.sort(index)]
+
+
+def _snap(trans: np.ndarray, tol: float) -> np.ndarray:
+    """wrap translations into [0, 1) and set the ones within `tol` of 0 to 0"""
+    trans = trans - np.rint(trans)
+    trans[np.abs(trans) < tol] = 0
+    return wrap_points(trans)
+
+
+def _match_atoms(
+    lookup: Callable[[np.ndarray], np.ndarray],
+    codes: np.ndarray,
+    rotated: np.ndarray,
+    trans: np.ndarray,
+    order: np.ndarray,
+    chunk_size: int,
+) -> np.ndarray:
+    """check which translations map all the rotated atoms onto atoms of their
+    species. Atoms are checked in `order`, in blocks of growing size, and
+    translations are dropped at the first block that fails them. The atoms that
+    failed any are moved to the front of `order`, in place, as they are likely to
+    fail the next translations too, e.g. the atoms around a defect."""
+    alive = np.arange(len(trans))
+    failed = []
+    start, size = 0, _FIRST_BLOCK
+    while start < len(order) and len(alive):
+        atoms = order[start : start + size]
+        keep = np.empty(len(alive), dtype=bool)
+        step = max(chunk_size // len(atoms), 1)
+        for first in range(0, len(alive), step):
+            pts = rotated[atoms] + trans[alive[first : first + step], None]
+            idx = lookup(pts.reshape(-1, 3)).reshape(-1, len(atoms))
+            matched = (idx >= 0) & (codes[idx] == codes[atoms])
+            keep[first : first + step] = matched.all(axis=1)
+            failed.append(atoms[~matched.all(axis=0)])
+        alive = alive[keep]
+        start, size = start + size, 4 * size
+    failed = np.unique(np.concatenate(failed))
+    order[:] = np.concatenate((failed, order[~np.isin(order, failed)]))
+    valid = np.zeros(len(trans), dtype=bool)
+    valid[alive] = True
+    return valid
+
+
+def _find_translations(
+    lookup: Callable[[np.ndarray], np.ndarray],
+    codes: np.ndarray,
+    rotated: np.ndarray,
+    trans: np.ndarray,
+    order: np.ndarray,
+    pure: np.ndarray,
+    tol: float,
+    chunk_size: int,
+) -> np.ndarray:
+    """valid translations of one rotation, the coset of the pure translations
+    through the first valid candidate, if any"""
+    step = max(chunk_size // len(codes), 1)
+    for start in range(0, len(trans), step):
+        candidates = trans[start : start + step]
+        valid = _match_atoms(lookup, codes, rotated, candidates, order, chunk_size)
+        if valid.any():
+            return _snap(candidates[valid.argmax()] + pure, tol)
+    return np.empty((0, 3))
+
+
+def find_space_group(
+    vec: np.ndarray,
+    positions: np.ndarray,
+    species: np.ndarray,
+    tol: float = 1e-6,
+    chunk_size: int = 65536,
+) -> SpaceGroup:
+    """find the space group of a crystal
+
+    Args:
+        vec (np.ndarray): 3x3 lattice basis vectors
+        positions (np.ndarray): Nx3 fractional coordinates of the atoms
+        species (np.ndarray): N species of the atoms, of any comparable type
+        tol (float): numerical tolerance, of the symmetry detection and of the
+            distance of matched atoms in fractional coordinates. Defaults to 1e-6.
+        chunk_size (int): number of atoms searched at a time. Defaults to 65536.
+
+    Raises:
+        ValueError: not one species for every atom
+
+    Returns:
+        SpaceGroup: the operations, those of the identity, i.e. the pure
+            translations, come first
+    """
+    positions = wrap_points(np.asarray(positions, dtype=float).reshape(-1, 3))
+    _, codes, counts = np.unique(species, return_inverse=True, return_counts=True)
+    codes = codes.ravel()
+    if len(codes) != len(positions) or len(positions) == 0:
+        raise ValueError("invalid species")
+    lookup = make_kpts_lookup(positions, tol)
+    rare = np.flatnonzero(codes == np.argmin(counts))
+    order = np.random.default_rng(0).permutation(len(codes))
+
+    syms = with_inversion(find_symmetry_ops(vec, tol))
+    rotations, translations, ops = [], [], []
+    pure = None
+    for sym, rot in zip(syms, to_crystal_ops(syms, vec, tol)):
+        rotated = positions @ rot
+        trans = _snap(positions[rare] - rotated[rare[0]], tol)
+        if pure is None:  # the identity comes first
+            valid = _match_atoms(lookup, codes, rotated, trans, order, chunk_size)
+            found = pure = trans[valid]
+        else:
+            found = _find_translations(
+                lookup, codes, rotated, trans, order, pure, tol, chunk_size
+            )
+        rotations += [rot] * len(found)
+        # rot is the map of kpoints of sym, M = vec @ sym @ inv(vec), which turns
+        # the fractional coordinates as rows like inv(sym) turns positions
+        ops += [sym.T] * len(found)
+        translations.append(found)
+    return SpaceGroup(np.array(rotations), np.concatenate(translations), np.array(ops))
@@ -0,0 +1,83 @@
+"""Opt-in instrumentation of the symmetry detection and kpoint reduction.
+
+Pass a `Stats` object to `reduce_kpts` and friends to find out where the time goes:
+
+>>> from dft_dummy.bravis import BravisLattice, make_lattice_bravis
+>>> from dft_dummy.crystal_utils import make_mesh
+>>> from dft_dummy.kpoints import reduce_kpts
+>>> vec, _ = make_lattice_bravis(BravisLattice.cubic, a=1)
+>>> stats = Stats()
+>>> _ = reduce_kpts(make_mesh(4, 4, 4), vec, stats=stats)
+>>> stats.counters["valid_ops"], stats.counters["unmatched"]
+(24, 0)
+>>> [name in stats.timers for name in ("rotate", "lookup", "components")]
+[True, True, True]
+
+Without a `Stats` object, a shared `NULL_STATS` that does nothing is used instead,
+and the extra work needed for counters is skipped, so the overhead is negligible.
+"""
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, ContextManager, Dict, Iterator
+
+import numpy as np
+
+
+class Stats:
+    """timers in seconds, counters and peak array sizes in bytes, all by name.
+    Timers and counters accumulate over repeated phases."""
+
+    enabled = True
+
+    def __init__(self, callback: Callable[[str, float], None] = None):
+        """
+        Args:
+            callback (Callable[[str, float], None]): called with the name and the
+                elapsed seconds at the end of every phase. Defaults to None.
+        """
+        self.timers: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.peaks: Dict[str, int] = {}
+        self.callback = callback
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """time the code in a `with` block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timers[name] = self.timers.get(name, 0.0) + elapsed
+            if self.callback is not None:
+                self.callback(name, elapsed)
+
+    def count(self, name: str, num: int = 1):
+        """increase a counter"""
+        self.counters[name] = self.counters.get(name, 0) + int(num)
+
+    def peak(self, name: str, arr: np.ndarray):
+        """record the size of an array if it is the largest so far"""
+        self.peaks[name] = max(self.peaks.get(name, 0), arr.nbytes)
+
+
+class _NullStats(Stats):
+    """does nothing, used when no instrumentation is asked for"""
+
+    enabled = False
+
+    def __init__(self):
+        super().__init__()
+        self._null = nullcontext()
+
+    def phase(self, name: str) -> ContextManager[None]:
+        return self._null
+
+    def count(self, name: str, num: int = 1):
+        pass
+
+    def peak(self, name: str, arr: np.ndarray):
+        pass
+
+
+NULL_STATS = _NullStats()
@@ -0,0 +1,187 @@
+"""On-disk store of kmeshes and their irreducible kpoints.
+
+Every entry is one file: a fixed preamble (magic bytes and the header length),
+a JSON header and then the raw arrays, each aligned to 64 bytes. The header holds
+the schema version, a fingerprint of the lattice and the dtype, shape and offset
+of every array, so the arrays can be memory-mapped without copying them. Files are
+written to a temporary name first and renamed afterwards, so readers, even in other
+processes, never see a half written file.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Tuple
+
+import numpy as np
+
+from dft_dummy.crystal_utils import make_mesh
+from dft_dummy.kpoints import IrreducibleKpts, find_irreducible_kpts
+
+SCHEMA_VERSION = 1
+_MAGIC = b"DFTDUMMY"
+_ALIGN = 64
+_PREAMBLE = len(_MAGIC) + 8  # magic + header length as uint64
+
+
+def lattice_fingerprint(vec: np.ndarray, tol: float = 1e-6) -> str:
+    """hash of the lattice basis vectors rounded to the tolerance
+
+    Args:
+        vec (np.ndarray): 3x3 lattice basis vectors
+        tol (float): numerical tolerance. Defaults to 1e-6.
+
+    Returns:
+        str: hex digest
+    """
+    rounded = np.round(np.asarray(vec, dtype=float) / tol).astype("<i8")
+    return hashlib.sha256(rounded.tobytes()).hexdigest()
+
+
+def mesh_key(
+    vec: np.ndarray,
+    nums: Tuple[int, int, int],
+    shifts: Tuple[bool, bool, bool] = (False, False, False),
+    tol: float = 1e-6,
+) -> str:
+    """key of a kmesh reduced on a lattice, used as the file name in the store
+
+    Args:
+        vec (np.ndarray): 3x3 lattice basis vectors
+        nums (Tuple[int, int, int]): number of points along each crystal axis
+        shifts (Tuple[bool, bool, bool]): half step offsets along each crystal axis
+        tol (float): numerical tolerance. Defaults to 1e-6.
+
+    Returns:
+        str: hex digest
+    """
+    desc = [lattice_fingerprint(vec, tol), [int(n) for n in nums]]
+    desc += [[bool(d) for d in shifts], repr(float(tol))]
+    return hashlib.sha256(json.dumps(desc).encode()).hexdigest()
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def save_arrays(path: str, arrays: Dict[str, np.ndarray], meta: dict = None):
+    """write arrays into one memory-mappable file, atomically
+
+    Args:
+        path (str): file path
+        arrays (Dict[str, np.ndarray]): arrays to write by their names
+        meta (dict): extra JSON serializable information. Defaults to None.
+    """
+    arrays = {k: np.ascontiguousarray(v) for k, v in arrays.items()}
+    descs, offset = [], 0
+    for name, arr in arrays.items():
+        descs.append(
+            dict(name=name, dtype=arr.dtype.str, shape=arr.shape, offset=offset)
+        )
+        offset = _aligned(offset + arr.nbytes)
+    header = dict(schema=SCHEMA_VERSION, meta=meta or {}, arrays=descs)
+    header = json.dumps(header).encode()
+    # arrays start at the first aligned position after the header
+    start = _aligned(_PREAMBLE + len(header))
+
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_MAGIC + np.uint64(len(header)).tobytes() + header)
+            for desc, arr in zip(descs, arrays.values()):
+                f.seek(start + desc["offset"])
+                f.write(arr.tobytes())
+            f.truncate(start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_arrays(path: str, mmap: bool = True) -> Tuple[Dict[str, np.ndarray], dict]:
+    """read arrays written by `save_arrays`
+
+    Args:
+        path (str): file path
+        mmap (bool): to map the arrays read-only instead of reading them.
+            Defaults to True.
+
+    Raises:
+        ValueError: not a file of the store or a different schema version
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], dict]: arrays by their names and the meta
+    """
+    with open(path, "rb") as f:
+        preamble = f.read(_PREAMBLE)
+        if len(preamble) != _PREAMBLE or preamble[: len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"invalid file, {path}")
+        size = int(np.frombuffer(preamble[len(_MAGIC) :], dtype=np.uint64)[0])
+        header = json.loads(f.read(size))
+    if header["schema"] != SCHEMA_VERSION:
+        raise ValueError(f"unsupported schema version, {header['schema']}")
+
+    start = _aligned(_PREAMBLE + size)
+    arrays = {}
+    for desc in header["arrays"]:
+        dtype, shape = np.dtype(desc["dtype"]), tuple(desc["shape"])
+        offset = start + desc["offset"]
+        if mmap and np.prod(shape) > 0:
+            arr = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+        else:
+            count = int(np.prod(shape))
+            arr = np.fromfile(path, dtype=dtype, count=count, offset=offset)
+            arr = arr.reshape(shape)
+        arrays[desc["name"]] = arr
+    return arrays, header["meta"]
+
+
+def cached_irreducible_kpts(
+    root: str,
+    vec: np.ndarray,
+    nx: int,
+    ny: int,
+    nz: int,
+    dx: bool = False,
+    dy: bool = False,
+    dz: bool = False,
+    tol: float = 1e-6,
+) -> Tuple[np.ndarray, IrreducibleKpts]:
+    """make a kmesh and find its irreducible kpoints, or map both from the store
+    if the same lattice and mesh has been reduced before. Entries that cannot be
+    read are replaced.
+
+    Args:
+        root (str): folder of the store
+        vec (np.ndarray): 3x3 lattice basis vectors
+        nx, ny, nz, dx, dy, dz: same as `make_mesh`
+        tol (float): numerical tolerance. Defaults to 1e-6.
+
+    Returns:
+        Tuple[np.ndarray, IrreducibleKpts]: Nx3 kmesh and its irreducible kpoints
+    """
+    fingerprint = lattice_fingerprint(vec, tol)
+    path = os.path.join(root, mesh_key(vec, (nx, ny, nz), (dx, dy, dz), tol))
+    if os.path.exists(path):
+        try:
+            arrays, meta = load_arrays(path)
+        except (KeyError, OSError, ValueError):
+            # truncated, corrupt or of another schema version, written anew
+            arrays, meta = {}, {}
+        if meta.get("fingerprint") == fingerprint:
+            kpts = arrays.pop("mesh")
+            return kpts, IrreducibleKpts(**arrays)
+
+    kpts = make_mesh(nx, ny, nz, dx, dy, dz)
+    ibz = find_irreducible_kpts(kpts, vec, tol)
+    os.makedirs(root, exist_ok=True)
+    meta = dict(
+        fingerprint=fingerprint,
+        mesh=[int(n) for n in (nx, ny, nz)],
+        shifts=[bool(d) for d in (dx, dy, dz)],
+    )
+    save_arrays(path, dict(mesh=kpts, **ibz._asdict()), meta)
+    return kpts, ibz
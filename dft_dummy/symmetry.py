@@ -12,13 +12,23 @@ and after the operation. `Magnitude` is a lousy word I used here. For accurate
 discussion, one can refer to the Wiki.
 """
 # flake8: noqa
-from typing import List
+from collections import OrderedDict
+from enum import Enum
+from functools import lru_cache
+from typing import List, Tuple
 
 import numpy as np
 
+from dft_dummy.crystal_utils import reduce_lattice
+from dft_dummy.stats import NULL_STATS, Stats
 
+SYMMETRY_CACHE_SIZE = 128  # number of lattices whose symmetry operations are kept
+_SYMMETRY_CACHE: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+
+
+@lru_cache(maxsize=None)
 def possible_unitary_rotations() -> np.ndarray:
-    """32 kinds of symmetry operations"""
+    """32 kinds of symmetry operations, the array is built once and read-only"""
     cos3, sin3 = np.cos(np.pi / 3), np.sin(np.pi / 3)
     mcos3, msin3 = -cos3, -sin3
     # fmt: off
@@ -57,7 +67,9 @@ def possible_unitary_rotations() -> np.ndarray:
         [mcos3 ,  sin3 ,  0.   ,  sin3 ,  cos3 ,  0.   ,  0.   ,  0.   , -1.   ],
     ]
     # fmt: on
-    return np.array(symms).reshape(-1, 3, 3)
+    symms = np.array(symms).reshape(-1, 3, 3)
+    symms.flags.writeable = False
+    return symms
 
 
 def possible_unitary_rotation_names() -> List[str]:
@@ -142,3 +154,184 @@ def check_symmetry(
     # the rotated vectors aligns with the original crystal.
     # otherwise, it means it is not a valid sym op.
     return np.all(np.abs(np.round(overlapped) - overlapped) < tol)
+
+
+def with_inversion(syms: np.ndarray) -> np.ndarray:
+    """append the inverted operations to a stack of symmetry operations
+
+    Args:
+        syms (np.ndarray): Kx3x3 unitary matrices
+
+    Returns:
+        np.ndarray: 2Kx3x3 unitary matrices, the inverted ones come last
+    """
+    return np.concatenate((syms, -syms))
+
+
+def check_symmetries(
+    syms: np.ndarray, vec: np.ndarray, overlap: np.ndarray = None, tol: float = 1e-6
+) -> np.ndarray:
+    """check a stack of symmetry operations against one or many sets of basis
+    vectors at once, see `check_symmetry` for how an operation is checked
+
+    Args:
+        syms (np.ndarray): Kx3x3 unitary matrices
+        vec (np.ndarray): 3x3 or Mx3x3 basis vectors
+        overlap (np.ndarray): 3x3 or Mx3x3 overlap matrices. Defaults to None.
+        tol (float): numerical tolerance. Defaults to 1e-6.
+
+    Returns:
+        np.ndarray: K or MxK boolean mask, true for valid operations
+    """
+    vec = np.asarray(vec, dtype=float)
+    if overlap is None:
+        overlap = np.linalg.inv(vec @ np.swapaxes(vec, -1, -2))
+    vecs = vec.reshape(-1, 1, 3, 3)
+    overlaps = np.asarray(overlap).reshape(-1, 1, 3, 3)
+
+    # same steps as `check_symmetry`, for all lattices and operations in one go
+    vec_projected_crys = vecs @ syms @ np.swapaxes(vecs, -1, -2)
+    overlapped = overlaps @ np.swapaxes(vec_projected_crys, -1, -2)
+    valid = np.all(np.abs(np.round(overlapped) - overlapped) < tol, axis=(-2, -1))
+    return valid if vec.ndim == 3 else valid[0]
+
+
+def find_symmetry_ops(
+    vec: np.ndarray, tol: float = 1e-6, stats: Stats = None
+) -> np.ndarray:
+    """find the symmetry operations that are valid for a set of basis vectors.
+    They are checked in the reduced basis of the lattice, see `reduce_lattice`, so
+    any basis of the same lattice gives the same operations. Results are cached by
+    the basis vectors rounded to the tolerance, and the least recently used ones
+    are dropped after `SYMMETRY_CACHE_SIZE` lattices.
+
+    Args:
+        vec (np.ndarray): 3x3 basis vectors
+        tol (float): numerical tolerance. Defaults to 1e-6.
+        stats (Stats): instrumentation, see `stats`. Defaults to None.
+
+    Returns:
+        np.ndarray: Kx3x3 valid operations in the cartisian system, read-only
+    """
+    stats = stats or NULL_STATS
+    vec = np.asarray(vec, dtype=float)
+    key = (tol, tuple(np.round(vec / tol).astype(np.int64).ravel()))
+    if key in _SYMMETRY_CACHE:
+        _SYMMETRY_CACHE.move_to_end(key)
+        stats.count("symmetry_cache_hits")
+        stats.count("valid_ops", len(_SYMMETRY_CACHE[key]))
+        return _SYMMETRY_CACHE[key]
+
+    with stats.phase("symmetry"):
+        symms = possible_unitary_rotations()
+        reduced, _ = reduce_lattice(vec, tol)
+        valid = check_symmetries(symms, reduced, tol=tol)
+        ops = np.ascontiguousarray(symms[valid])
+    ops.flags.writeable = False
+    stats.count("valid_ops", len(ops))
+    _SYMMETRY_CACHE[key] = ops
+    if len(_SYMMETRY_CACHE) > SYMMETRY_CACHE_SIZE:
+        _SYMMETRY_CACHE.popitem(last=False)
+    return ops
+
+
+def to_crystal_ops(syms: np.ndarray, vec: np.ndarray, tol: float = 1e-6) -> np.ndarray:
+    """express symmetry operations in the crystal coordinates of the reciprocal
+    basis, the coordinates kpoints are given in. Valid operations of a lattice
+    become integer matrices there. They are found as integers in the reduced
+    basis, see `reduce_lattice`, and mapped back exactly, M = inv(T) @ M' @ T.
+
+    Args:
+        syms (np.ndarray): Kx3x3 unitary matrices in the cartisian system
+        vec (np.ndarray): 3x3 basis vectors
+        tol (float): numerical tolerance. Defaults to 1e-6.
+
+    Raises:
+        ValueError: an operation is not a valid one of the lattice
+
+    Returns:
+        np.ndarray: Kx3x3 integer matrices
+    """
+    reduced, trans = reduce_lattice(vec, tol)
+    ops = reduced @ syms @ np.linalg.inv(reduced)
+    ops_int = np.round(ops).astype(np.int64)
+    if np.any(np.abs(ops - ops_int) > tol):
+        raise ValueError("not a valid symmetry operation of the lattice")
+    inv_trans = np.round(np.linalg.inv(trans)).astype(np.int64)
+    return inv_trans @ ops_int @ trans
+
+
+def to_cartesian_ops(ops: np.ndarray, vec: np.ndarray) -> np.ndarray:
+    """the inverse of `to_crystal_ops`
+
+    Args:
+        ops (np.ndarray): Kx3x3 integer matrices in crystal coordinates
+        vec (np.ndarray): 3x3 basis vectors
+
+    Returns:
+        np.ndarray: Kx3x3 unitary matrices in the cartisian system
+    """
+    return np.linalg.inv(vec) @ ops @ vec
+
+
+class SymmetryMode(str, Enum):
+    full = "full"  # point group and time reversal, k -> -k
+    # proper rotations only, without inversion, mirrors and time reversal
+    rotations = "rotations"
+    time_reversal = "time_reversal"  # time reversal only
+
+
+def apply_symmetry_mode(
+    syms: np.ndarray, mode: SymmetryMode = SymmetryMode.full
+) -> np.ndarray:
+    """pick the operations of a mode given the valid operations of a lattice.
+    The point group of a lattice always holds the inversion, the same operation
+    on kpoints as time reversal, so `rotations` drops all improper operations.
+
+    Args:
+        syms (np.ndarray): Kx3x3 valid operations like from `find_symmetry_ops`
+        mode (SymmetryMode): which operations. Defaults to SymmetryMode.full.
+
+    Raises:
+        ValueError: wrong mode
+
+    Returns:
+        np.ndarray: Kx3x3 operations in the cartisian system
+    """
+    if mode == SymmetryMode.full:
+        return with_inversion(syms)
+    elif mode == SymmetryMode.rotations:
+        return syms
+    elif mode == SymmetryMode.time_reversal:
+        return with_inversion(np.eye(3)[None])
+    raise ValueError(f"unsupported symmetry mode, {mode}")
+
+
+def select_symmetry_ops(
+    vec: np.ndarray,
+    mode: SymmetryMode = SymmetryMode.full,
+    tol: float = 1e-6,
+    stats: Stats = None,
+) -> np.ndarray:
+    """the symmetry operations of a lattice used for kpoint reduction
+
+    Args:
+        vec (np.ndarray): 3x3 basis vectors
+        mode (SymmetryMode): which operations. Defaults to SymmetryMode.full.
+        tol (float): numerical tolerance. Defaults to 1e-6.
+        stats (Stats): instrumentation, see `stats`. Defaults to None.
+
+    Raises:
+        ValueError: wrong mode
+
+    Returns:
+        np.ndarray: Kx3x3 operations in the cartisian system
+    """
+    if mode == SymmetryMode.time_reversal:
+        return apply_symmetry_mode(np.eye(3)[None], mode)  # no detection needed
+    return apply_symmetry_mode(find_symmetry_ops(vec, tol, stats), mode)
+
+
+def clear_symmetry_cache():
+    """forget all symmetry operations cached by `find_symmetry_ops`"""
+    _SYMMETRY_CACHE.clear()
@@ -0,0 +1,346 @@
+"""Brillouin zone integration with the linear tetrahedron method
+[Bloechl, Jepsen and Andersen, PRB 49, 16223 (1994)] on the meshes of `make_mesh`.
+
+Every subcell of the mesh, spanned by a mesh point and its neighbours along the
+crystal axes, is cut into 6 tetrahedra around its shortest main diagonal. They are
+found by index arithmetic on the mesh order, see `crystal_utils.mesh_flat_index`,
+for all subcells at once. Within a tetrahedron the energies are interpolated
+linearly, so the density of states, the number of states and the occupations have
+closed forms in the sorted corner energies. They are evaluated for chunks of
+tetrahedra and bands at once, and only at the energies within the range of a
+tetrahedron.
+
+Equivalent tetrahedra, the ones whose corners have the same irreducible kpoints,
+see `reduce_tetrahedra`, contribute the same, so only one of each is evaluated.
+"""
+from itertools import permutations
+from typing import Iterator, NamedTuple, Tuple
+
+import numpy as np
+
+from dft_dummy.crystal_utils import (
+    calc_reciprocal,
+    index_dtype,
+    mesh_flat_index,
+    mesh_grid,
+)
+
+# the 4 main diagonals of a subcell, by the corner they start from
+_DIAGONAL_STARTS = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]])
+# the 6 tetrahedra around the diagonal from (0, 0, 0) to (1, 1, 1), walking from one
+# end to the other along the axes in every order
+_TETRA_OFFSETS = np.array(
+    [
+        np.cumsum([[0, 0, 0], *np.eye(3, dtype=int)[list(axes)]], axis=0)
+        for axes in permutations(range(3))
+    ]
+)
+
+
+class Tetrahedra(NamedTuple):
+    """tetrahedra of a mesh and how many of the mesh each one stands for"""
+
+    corners: np.ndarray  # Tx4 indices of the corner kpoints
+    weights: np.ndarray  # T integer multiplicities, sum up to 6 * nx * ny * nz
+
+    @property
+    def volumes(self) -> np.ndarray:
+        """fractions of the Brillouin zone the tetrahedra stand for, sum up to one"""
+        return self.weights / self.weights.sum()
+
+
+def make_tetrahedra(vec: np.ndarray, nx: int, ny: int, nz: int) -> Tetrahedra:
+    """cut the mesh from `make_mesh` into tetrahedra, 6 per subcell around its
+    shortest main diagonal in the cartisian system. The offsets of the mesh do not
+    change the tetrahedra.
+
+    Args:
+        vec (np.ndarray): 3x3 lattice basis vectors
+        nx, ny, nz: same as `make_mesh`
+
+    Returns:
+        Tetrahedra: 6 * nx * ny * nz tetrahedra with corners indexing the mesh
+    """
+    nums = np.array([nx, ny, nz])
+    if np.any(nums <= 0):
+        raise ValueError("invalid number of points")
+    # a diagonal starting from s runs along +1 on the axes where s is 0 and -1
+    # elsewhere, pick the shortest one
+    signs = 1 - 2 * _DIAGONAL_STARTS
+    lengths = np.linalg.norm((signs / nums) @ calc_reciprocal(vec).T, axis=1)
+    start = _DIAGONAL_STARTS[np.argmin(lengths)]
+    offsets = np.abs(_TETRA_OFFSETS - start).reshape(-1, 3)
+
+    npts = nx * ny * nz
+    grid = mesh_grid(np.arange(npts), nx, ny, nz)
+    corners = np.empty((npts, len(offsets)), dtype=index_dtype(npts))
+    for i, offset in enumerate(offsets):
+        corners[:, i] = mesh_flat_index(grid + offset[:, None], nx, ny, nz)
+    corners = corners.reshape(-1, 4)
+    return Tetrahedra(corners, np.ones(len(corners), dtype=np.int64))
+
+
+def reduce_tetrahedra(tetra: Tetrahedra, labels: np.ndarray) -> Tetrahedra:
+    """reduce tetrahedra to the irreducible ones, the ones whose corners have
+    distinct sets of irreducible kpoints
+
+    Args:
+        tetra (Tetrahedra): tetrahedra of a mesh like from `make_tetrahedra`
+        labels (np.ndarray): N labels that map the mesh to the irreducible kpoints,
+            like from `kpoints.reduce_kpts`
+
+    Returns:
+        Tetrahedra: irreducible tetrahedra with corners indexing the irreducible
+            kpoints, i.e. the labels, and the summed multiplicities
+    """
+    labels = np.asarray(labels)
+    corners = np.sort(labels[tetra.corners], axis=1)
+    corners, inverse = np.unique(corners, axis=0, return_inverse=True)
+    weights = np.bincount(inverse.ravel(), tetra.weights, len(corners))
+    corners = corners.astype(index_dtype(len(labels)))
+    return Tetrahedra(corners, weights.astype(np.int64))
+
+
+def _as_bands(energies: np.ndarray) -> np.ndarray:
+    """energies as NxB, one column per band"""
+    energies = np.asarray(energies, dtype=float)
+    return energies.reshape(len(energies), -1)
+
+
+def _sort_corners(
+    energies: np.ndarray, corners: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """energies of the corners of every tetrahedron and band in ascending order,
+    and the corners in the same order as flat indices of the NxB energies, both
+    T*Bx4"""
+    nbands = energies.shape[1]
+    corner_energies = np.swapaxes(energies[corners], 1, 2)  # TxBx4
+    corners = corners[:, None] * nbands + np.arange(nbands)[:, None]
+    order = np.argsort(corner_energies, axis=2, kind="stable")
+    sorted_energies = np.take_along_axis(corner_energies, order, axis=2)
+    corners = np.take_along_axis(corners, order, axis=2)
+    return sorted_energies.reshape(-1, 4), corners.reshape(-1, 4)
+
+
+def _number_and_dos(eps: np.ndarray, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """number of states and density of states of tetrahedra of unit volume, every
+    formula is only evaluated in its range, where it divides by positive numbers
+
+    Args:
+        eps (np.ndarray): Px4 sorted corner energies
+        x (np.ndarray): P energies, one per tetrahedron
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: P numbers and P densities of states
+    """
+    region = np.sum(x[:, None] >= eps, axis=1)
+    number, dos = (region == 4).astype(float), np.zeros(len(x))
+
+    sel = np.flatnonzero(region == 1)
+    e1, e2, e3, e4 = eps[sel].T
+    low = x[sel] - e1
+    scale = low / ((e2 - e1) * (e3 - e1) * (e4 - e1))
+    number[sel], dos[sel] = scale * low * low, 3 * scale * low
+
+    sel = np.flatnonzero(region == 2)
+    e1, e2, e3, e4 = eps[sel].T
+    d21, mid = e2 - e1, x[sel] - e2
+    scale = 1 / ((e3 - e1) * (e4 - e1))
+    curve = (e3 - e1 + e4 - e2) / ((e3 - e2) * (e4 - e2))
+    number[sel] = scale * (d21 * d21 + 3 * mid * (d21 + mid) - curve * mid ** 3)
+    dos[sel] = scale * (3 * d21 + 6 * mid - 3 * curve * mid * mid)
+
+    sel = np.flatnonzero(region == 3)
+    e1, e2, e3, e4 = eps[sel].T
+    high = e4 - x[sel]
+    scale = high / ((e4 - e1) * (e4 - e2) * (e4 - e3))
+    number[sel], dos[sel] = 1 - scale * high * high, 3 * scale * high
+    return number, dos
+
+
+def _iter_chunks(
+    energies: np.ndarray, tetra: Tetrahedra, chunk_size: int
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """yield the sorted corner energies and corners, see `_sort_corners`, and the
+    volumes of the tetrahedra and bands, at most `chunk_size` of them at a time"""
+    nbands = energies.shape[1]
+    volumes = tetra.volumes
+    step = max(chunk_size // nbands, 1)
+    for start in range(0, len(tetra.corners), step):
+        block = slice(start, start + step)
+        eps, corners = _sort_corners(energies, tetra.corners[block])
+        yield eps, corners, np.repeat(volumes[block], nbands)
+
+
+def tetrahedron_dos(
+    energies: np.ndarray,
+    tetra: Tetrahedra,
+    omegas: np.ndarray,
+    chunk_size: int = 2 ** 18,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """density of states and number of states of all the bands at some energies.
+    Only the energies within the range of a tetrahedron are evaluated, the ones
+    above it get its whole volume through a cumulative sum.
+
+    Args:
+        energies (np.ndarray): N or NxB energies of the kpoints the corners of the
+            tetrahedra index
+        tetra (Tetrahedra): tetrahedra like from `make_tetrahedra` or
+            `reduce_tetrahedra`
+        omegas (np.ndarray): E energies to evaluate at
+        chunk_size (int): number of tetrahedra times bands, and of pairs of them
+            and energies, at a time. Defaults to 2 ** 18.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: E densities of states and E numbers of
+            states, per cell, the number goes up to B
+    """
+    omegas = np.asarray(omegas, dtype=float).ravel()
+    order = np.argsort(omegas)
+    sorted_omegas = omegas[order]
+    num = len(omegas)
+    dos, number, filled = np.zeros(num), np.zeros(num), np.zeros(num + 1)
+    for eps, _, volumes in _iter_chunks(_as_bands(energies), tetra, chunk_size):
+        # the energies in [e1, e4) of every tetrahedron, as pairs of indices
+        first = np.searchsorted(sorted_omegas, eps[:, 0])
+        last = np.searchsorted(sorted_omegas, eps[:, 3])
+        filled += np.bincount(last, volumes, num + 1)
+        counts = last - first
+        tetras = np.repeat(np.arange(len(eps)), counts)
+        steps = np.arange(len(tetras)) - np.repeat(np.cumsum(counts) - counts, counts)
+        indices = first[tetras] + steps
+        for start in range(0, len(tetras), chunk_size):
+            block = slice(start, start + chunk_size)
+            pairs, index = tetras[block], indices[block]
+            pair_number, pair_dos = _number_and_dos(eps[pairs], sorted_omegas[index])
+            number += np.bincount(index, pair_number * volumes[pairs], num)
+            dos += np.bincount(index, pair_dos * volumes[pairs], num)
+    number += np.cumsum(filled)[:num]
+    result = np.empty((2, num))
+    result[:, order] = dos, number
+    return result[0], result[1]
+
+
+def find_fermi_level(
+    energies: np.ndarray,
+    tetra: Tetrahedra,
+    num_states: float,
+    tol: float = 1e-10,
+    num_trials: int = 64,
+) -> float:
+    """find the energy below which there are a number of states, trying many
+    energies at once and narrowing the range down to the two around it
+
+    Args:
+        energies (np.ndarray): N or NxB energies, same as `tetrahedron_dos`
+        tetra (Tetrahedra): tetrahedra, same as `tetrahedron_dos`
+        num_states (float): number of occupied states per cell, e.g. half the
+            electrons if every band holds two of them
+        tol (float): width of the energy range to stop at, relative to the width
+            of the bands. Defaults to 1e-10.
+        num_trials (int): energies tried at a time. Defaults to 64.
+
+    Raises:
+        ValueError: not that many states in the bands
+
+    Returns:
+        float: the Fermi level
+    """
+    energies = _as_bands(energies)
+    if not 0 < num_states <= energies.shape[1]:
+        raise ValueError("invalid number of states")
+    low, high = energies.min(), energies.max()
+    width = tol * (high - low)
+    while high - low > width:
+        omegas = np.linspace(low, high, num_trials + 1)
+        _, number = tetrahedron_dos(energies, tetra, omegas)
+        idx = np.clip(np.searchsorted(number, num_states), 1, num_trials)
+        if omegas[idx - 1] == low and omegas[idx] == high:
+            break  # no float left in between
+        low, high = omegas[idx - 1], omegas[idx]
+    return (low + high) / 2
+
+
+def _corner_weights(eps: np.ndarray, fermi: float) -> np.ndarray:
+    """occupations of the sorted corners of tetrahedra of unit volume, they sum
+    up to the number of states of a tetrahedron"""
+    e1, e2, e3, e4 = eps.T
+    x = fermi
+    d21, d31, d41, d32, d42, d43 = e2 - e1, e3 - e1, e4 - e1, e3 - e2, e4 - e2, e4 - e3
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # x in [e1, e2)
+        low = x - e1
+        c = low ** 3 / (d21 * d31 * d41) / 4
+        first = np.stack(
+            [
+                c * (4 - low * (1 / d21 + 1 / d31 + 1 / d41)),
+                c * low / d21,
+                c * low / d31,
+                c * low / d41,
+            ],
+            axis=1,
+        )
+        # x in [e2, e3)
+        c1 = low ** 2 / (d41 * d31) / 4
+        c2 = low * (x - e2) * (e3 - x) / (d41 * d32 * d31) / 4
+        c3 = (x - e2) ** 2 * (e4 - x) / (d42 * d32 * d41) / 4
+        second = np.stack(
+            [
+                c1 + (c1 + c2) * (e3 - x) / d31 + (c1 + c2 + c3) * (e4 - x) / d41,
+                c1 + c2 + c3 + (c2 + c3) * (e3 - x) / d32 + c3 * (e4 - x) / d42,
+                (c1 + c2) * low / d31 + (c2 + c3) * (x - e2) / d32,
+                (c1 + c2 + c3) * low / d41 + c3 * (x - e2) / d42,
+            ],
+            axis=1,
+        )
+        # x in [e3, e4)
+        high = e4 - x
+        c = high ** 3 / (d41 * d42 * d43) / 4
+        third = np.stack(
+            [
+                0.25 - c * high / d41,
+                0.25 - c * high / d42,
+                0.25 - c * high / d43,
+                0.25 - c * (4 - high * (1 / d41 + 1 / d42 + 1 / d43)),
+            ],
+            axis=1,
+        )
+    regions = [x < eps[:, :1], x < eps[:, 1:2], x < eps[:, 2:3], x < eps[:, 3:]]
+    return np.select(regions, [0, first, second, third], 0.25)
+
+
+def tetrahedron_weights(
+    energies: np.ndarray,
+    tetra: Tetrahedra,
+    fermi: float,
+    correction: bool = True,
+    chunk_size: int = 2 ** 18,
+) -> np.ndarray:
+    """integration weights of the kpoints and bands, the occupations below the
+    Fermi level, so that sum(weights * f) integrates f over the occupied states
+
+    Args:
+        energies (np.ndarray): N or NxB energies, same as `tetrahedron_dos`
+        tetra (Tetrahedra): tetrahedra, same as `tetrahedron_dos`
+        fermi (float): the Fermi level, e.g. from `find_fermi_level`
+        correction (bool): add the curvature correction of Bloechl et al. to
+            the linear interpolation, it leaves the sum unchanged. Defaults to True.
+        chunk_size (int): number of tetrahedra times bands at a time. Defaults to
+            2 ** 18.
+
+    Returns:
+        np.ndarray: NxB weights, they sum up to the number of states below `fermi`
+    """
+    energies = _as_bands(energies)
+    weights = np.zeros(energies.size)
+    for eps, corners, volumes in _iter_chunks(energies, tetra, chunk_size):
+        corner_weights = _corner_weights(eps, fermi)
+        if correction:
+            _, dos = _number_and_dos(eps, np.full(len(eps), fermi))
+            # dos / 40 * sum_j (e_j - e_i)
+            corner_weights += (dos / 40)[:, None] * (
+                eps.sum(axis=1, keepdims=True) - 4 * eps
+            )
+        corner_weights *= volumes[:, None]
+        weights += np.bincount(corners.ravel(), corner_weights.ravel(), len(weights))
+    return weights.reshape(energies.shape)
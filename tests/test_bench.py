@@ -0,0 +1,36 @@
+import importlib.util
+import json
+import os
+
+import pytest
+from click.testing import CliRunner
+
+BENCH = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "bench.py")
+
+
+@pytest.fixture(scope="module")
+def bench():
+    spec = importlib.util.spec_from_file_location("bench", BENCH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_run(bench, tmp_path):
+    """the documented command, on tiny meshes and every lattice by default"""
+    output = str(tmp_path / "bench.json")
+    args = ["run", "-o", output, "--sizes", "2,3", "--repeat", "1"]
+    result = CliRunner().invoke(bench.cli, args)
+    assert result.exit_code == 0, result.output
+    with open(output) as f:
+        results = json.load(f)
+    lattices = {rec["lattice"] for rec in results["records"] if rec["lattice"]}
+    assert lattices == {brav.name for brav in bench.LATTICE_PARAMS}
+    assert "reduce_mesh[cubic]" in results["scaling"]
+
+
+def test_run_unknown_lattice(bench, tmp_path):
+    args = ["run", "-o", str(tmp_path / "bench.json"), "--lattice", "trigonal"]
+    result = CliRunner().invoke(bench.cli, args)
+    assert result.exit_code == 2
+    assert "--lattice" in result.output
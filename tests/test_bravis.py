@@ -77,3 +77,34 @@ def test_missing_param_bravis_input(bravis_kwargs):
         del kw[k]
         with pytest.raises((KeyError, TypeError)):
             _ = bravis.make_lattice_bravis(brav, **kw)
+
+
+def test_bravis_batch(bravis_kwargs):
+    brav, kwargs = bravis_kwargs
+    scales = np.array([1.0, 1.1, 0.9, 1.5])
+    batch = {k: v * scales if k in "abc" else np.full(4, v) for k, v in kwargs.items()}
+    vecs, vols = bravis.make_lattice_bravis_batch(brav, **batch)
+    assert vecs.shape == (4, 3, 3)
+    assert vols.shape == (4,)
+    for i, scale in enumerate(scales):
+        kw = {k: v * scale if k in "abc" else v for k, v in kwargs.items()}
+        vec, vol = bravis.make_lattice_bravis(brav, **kw)
+        assert np.allclose(vecs[i], vec)
+        assert np.allclose(vols[i], vol)
+        assert np.allclose(vols[i], bravis.calc_volume(vecs[i]))
+
+
+def test_bravis_batch_broadcast():
+    vecs, vols = bravis.make_lattice_bravis_batch(
+        bravis.BravisLattice.monoclinic, a=[1, 2, 3], b=2, c=3, beta=ACOS0_5
+    )
+    assert vecs.shape == (3, 3, 3)
+    assert np.allclose(vecs[:, 0, 0], [1, 2, 3])
+    assert np.allclose(vols, [bravis.calc_volume(v) for v in vecs])
+
+
+def test_bravis_batch_throw():
+    with pytest.raises(KeyError):
+        bravis.make_lattice_bravis_batch(bravis.BravisLattice.hcp, a=[1, 2])
+    with pytest.raises(ValueError):
+        bravis.make_lattice_bravis_batch("unknown", a=[1, 2])
@@ -0,0 +1,57 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from dft_dummy.bravis import BravisLattice, make_lattice_bravis
+from dft_dummy.brillouin import find_reciprocal_shells, fold_to_bz, make_bz_fold
+
+
+@pytest.mark.parametrize(
+    "kwargs,brav",
+    [
+        (dict(a=1), BravisLattice.fcc),
+        (dict(a=1), BravisLattice.bcc),
+        (dict(a=1, c=1.6), BravisLattice.hcp),
+        (dict(a=1, b=2, c=3, beta=0.4), BravisLattice.monoclinic),
+        (dict(a=1, b=2, c=3, alpha=1.1, beta=1.2, gamma=1.3), BravisLattice.triclinic),
+    ],
+)
+def test_fold_to_bz(kwargs, brav):
+    vec, _ = make_lattice_bravis(brav, **kwargs)
+    rvec = np.linalg.inv(vec)
+    kpts = np.random.uniform(-3, 3, (500, 3))
+    folded = fold_to_bz(kpts, vec, chunk_size=77)
+    assert np.allclose(kpts - folded, np.round(kpts - folded))
+    # shortest image among a large block of reciprocal lattice vectors
+    shifts = np.array(list(itertools.product(range(-5, 6), repeat=3)))
+    images = (kpts[:, None] - shifts[None]) @ rvec.T
+    shortest = np.linalg.norm(images, axis=2).min(axis=1)
+    assert np.allclose(np.linalg.norm(folded @ rvec.T, axis=1), shortest)
+
+
+def test_fold_boundary():
+    kpts = np.array([[0.5, 0, 0], [-0.5, 0.5, 0.5], [0.7, 0, 0], [0.2, 1, -3]])
+    folded = make_bz_fold(np.eye(3))(kpts)
+    assert np.allclose(
+        folded, [[0.5, 0, 0], [-0.5, 0.5, 0.5], [-0.3, 0, 0], [0.2, 0, 0]]
+    )
+    with pytest.raises(ValueError):
+        make_bz_fold(np.eye(3), chunk_size=0)
+
+
+def test_find_reciprocal_shells():
+    shells = find_reciprocal_shells(np.eye(3)).tolist()
+    cube = [list(n) for n in itertools.product([-1, 0, 1], repeat=3)]
+    assert shells == sorted(cube, key=lambda n: (np.dot(n, n), n))
+
+
+def test_fold_skewed_basis():
+    vec, _ = make_lattice_bravis(BravisLattice.hcp, a=1, c=1.6)
+    skew = np.array([[1, 0, 0], [300, 1, 0], [2000, 700, 1]])
+    kpts = np.random.rand(100, 3)
+    folded = fold_to_bz(kpts, vec)
+    # kpoints in crystal coordinates of `skew @ vec` are skew @ k
+    folded_skewed = fold_to_bz(kpts @ skew.T, skew @ vec)
+    rvec, rvec_skewed = np.linalg.inv(vec), np.linalg.inv(skew @ vec)
+    assert np.allclose(folded_skewed @ rvec_skewed.T, folded @ rvec.T)
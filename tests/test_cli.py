@@ -0,0 +1,102 @@
+import io
+import json
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from dft_dummy.bravis import BravisLattice, make_lattice_bravis
+from dft_dummy.cli import cli
+from dft_dummy.crystal_utils import make_mesh
+from dft_dummy.kpoints import find_irreducible_kpts
+
+
+@pytest.fixture
+def runner():
+    return CliRunner()
+
+
+def expected_rows(bravis, mesh, shift, **kwargs):
+    vec, _ = make_lattice_bravis(bravis, **kwargs)
+    ibz = find_irreducible_kpts(make_mesh(*mesh, *shift), vec)
+    return np.column_stack((ibz.kpts, ibz.weights))
+
+
+def test_kmesh_text(runner):
+    args = "kmesh hcp --a 1 --c 2 --mesh 4 4 2 --shift 0 0 1"
+    result = runner.invoke(cli, args.split())
+    assert result.exit_code == 0, result.output
+    rows = np.loadtxt(io.StringIO(result.output))
+    exp = expected_rows(BravisLattice.hcp, (4, 4, 2), (0, 0, 1), a=1, c=2)
+    assert np.allclose(rows, exp)
+
+
+@pytest.mark.parametrize("fmt", ["npy", "bin"])
+def test_kmesh_binary(runner, tmp_path, fmt):
+    path = str(tmp_path / "out")
+    args = f"kmesh fcc --a 1 --mesh 4 4 4 --format {fmt} -o {path}"
+    result = runner.invoke(cli, args.split())
+    assert result.exit_code == 0, result.output
+    if fmt == "npy":
+        rows = np.load(path)
+    else:
+        rows = np.fromfile(path, dtype="<f8").reshape(-1, 4)
+    assert np.allclose(
+        rows, expected_rows(BravisLattice.fcc, (4, 4, 4), (0, 0, 0), a=1)
+    )
+
+
+def test_kmesh_throw(runner):
+    result = runner.invoke(cli, "kmesh hcp --a 1 --mesh 4 4 4".split())
+    assert result.exit_code != 0
+    assert "missing lattice parameter" in result.output
+    result = runner.invoke(cli, "kmesh fcc --a 1 --mesh 4 4 4 --shift 0 2 0".split())
+    assert result.exit_code != 0
+    # a lattice of the choices that make_lattice_bravis does not support
+    result = runner.invoke(cli, "kmesh trigonal --a 1 --mesh 2 2 2".split())
+    assert result.exit_code == 2
+    assert "invalid lattice trigonal" in result.output
+
+
+def test_batch(runner, tmp_path):
+    lattices = tmp_path / "lattices.jsonl"
+    params = [dict(bravis="fcc", a=1), dict(bravis="hcp", a=1, c=2)]
+    lattices.write_text("\n".join(json.dumps(p) for p in params) + "\n")
+    out = tmp_path / "out"
+    args = f"batch {lattices} --mesh 4 4 4 --format npy --workers 2 -d {out}"
+    result = runner.invoke(cli, args.split())
+    assert result.exit_code == 0, result.output
+    for i, param in enumerate(params):
+        param = dict(param)
+        bravis = BravisLattice[param.pop("bravis")]
+        rows = np.load(str(out / f"{i}.npy"))
+        assert np.allclose(rows, expected_rows(bravis, (4, 4, 4), (0, 0, 0), **param))
+
+
+@pytest.mark.parametrize(
+    "param", [dict(bravis="unknown", a=1), dict(bravis="fcc", a=1, d=2)]
+)
+def test_batch_invalid(runner, tmp_path, param):
+    lattices = tmp_path / "lattices.jsonl"
+    lattices.write_text(json.dumps(param))
+    result = runner.invoke(cli, ["batch", str(lattices), "--mesh", "2", "2", "2"])
+    assert result.exit_code != 0
+    assert "invalid lattice" in result.output
+
+
+def test_batch_missing(runner, tmp_path):
+    lattices = tmp_path / "lattices.jsonl"
+    lattices.write_text(json.dumps(dict(bravis="hcp", a=1)))
+    args = ["batch", str(lattices), "--mesh", "2", "2", "2", "-d", str(tmp_path)]
+    result = runner.invoke(cli, args)
+    assert result.exit_code != 0
+    assert "missing lattice parameter" in result.output
+
+
+def test_batch_unsupported(runner, tmp_path):
+    lattices = tmp_path / "lattices.jsonl"
+    lattices.write_text(json.dumps(dict(bravis="trigonal", a=1)))
+    args = ["batch", str(lattices), "--mesh", "2", "2", "2", "-d", str(tmp_path)]
+    result = runner.invoke(cli, args)
+    assert result.exit_code == 2
+    assert "invalid lattice" in result.output
@@ -13,6 +13,37 @@ def test_project():
     assert np.allclose(pts_proj, pts_proj_exp)
 
 
+def test_project_dtype():
+    vec = np.random.randn(3, 3)
+    pts = np.random.randn(10, 3)
+    pts_proj = crystal_utils.project_points(vec, pts, dtype=np.float32)
+    assert pts_proj.dtype == np.float32
+    assert np.allclose(pts_proj, crystal_utils.project_points(vec, pts), atol=1e-5)
+
+
+def test_reduce_lattice():
+    vec = np.array([[1, 0, 0], [-0.5, 0.75 ** 0.5, 0], [0, 0, 1.6]])  # hcp
+    skew = np.array([[1, 0, 0], [1000, 1, 0], [3000, 2001, 1]])
+    reduced, trans = crystal_utils.reduce_lattice(skew @ vec)
+    assert trans.dtype.kind == "i"
+    assert round(np.linalg.det(trans)) == 1
+    assert np.allclose(trans @ skew @ vec, reduced)
+    assert np.allclose(np.linalg.norm(reduced, axis=1), [1, 1, 1.6])
+    # a reduced basis is kept
+    fcc = np.array([[0.5, 0, 0.5], [0.5, 0.5, 0], [0, 0.5, 0.5]])
+    reduced, trans = crystal_utils.reduce_lattice(fcc)
+    assert np.array_equal(reduced, fcc)
+    assert np.array_equal(trans, np.eye(3))
+
+
+def test_compact_tol():
+    assert crystal_utils.compact_tol(1e-6, np.float64) == 1e-6
+    assert crystal_utils.compact_tol(1e-6, np.float32) > 1e-6
+    assert crystal_utils.compact_tol(1e-3, np.float32) == 1e-3
+    assert crystal_utils.index_dtype(1000) == np.int32
+    assert crystal_utils.index_dtype(2 ** 31) == np.int64
+
+
 def test_project_throw():
     vec = np.random.randn(3, 3)
     pts = np.random.randn(3, 10)
@@ -85,3 +116,29 @@ def test_mesh(args, res_exp):
 def test_mesh_throw(args):
     with pytest.raises(ValueError):
         crystal_utils.make_mesh(*args)
+
+
+@pytest.mark.parametrize("args", [(3, 4, 5, 0, 0, 0), (2, 3, 1, 1, 0, 1)])
+def test_mesh_points(args):
+    mesh = crystal_utils.make_mesh(*args)
+    index = np.arange(len(mesh))
+    assert np.array_equal(crystal_utils.mesh_points(index, *args), mesh)
+    assert crystal_utils.mesh_index(mesh, *args).tolist() == index.tolist()
+    assert crystal_utils.mesh_index(mesh - 1, *args).tolist() == index.tolist()
+    assert crystal_utils.mesh_index(mesh + 0.01, *args).tolist() == [-1] * len(mesh)
+
+
+def test_iter_mesh():
+    args = (5, 3, 4, 1, 1, 0)
+    blocks = list(crystal_utils.iter_mesh(*args, chunk_size=7, dtype=np.float32))
+    assert [len(b) for b in blocks] == [7] * 8 + [4]
+    assert all(b.dtype == np.float32 for b in blocks)
+    assert np.allclose(np.concatenate(blocks), crystal_utils.make_mesh(*args))
+    with pytest.raises(ValueError):
+        next(crystal_utils.iter_mesh(*args, chunk_size=0))
+
+
+def test_mesh_dtype():
+    mesh = crystal_utils.make_mesh(2, 2, 2, dtype=np.float32)
+    assert mesh.dtype == np.float32
+    assert mesh.shape == (8, 3)
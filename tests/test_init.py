@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+import pytest
+
+import dft_dummy
+from dft_dummy import bravis, kpoints
+
+
+def test_lazy_api():
+    assert dft_dummy.make_lattice_bravis is bravis.make_lattice_bravis
+    assert dft_dummy.reduce_kpts is kpoints.reduce_kpts
+    assert set(dft_dummy.__all__) <= set(dir(dft_dummy))
+    for name in dft_dummy.__all__:
+        assert getattr(dft_dummy, name).__name__ == name
+    with pytest.raises(AttributeError):
+        dft_dummy.unknown
+
+
+def test_import_light():
+    """lattices and meshes do not import scipy"""
+    code = (
+        "import sys, dft_dummy;"
+        "dft_dummy.make_lattice_bravis(dft_dummy.BravisLattice.fcc, a=1);"
+        "dft_dummy.make_mesh(4, 4, 4);"
+        "dft_dummy.iter_irreducible_mesh;"
+        "print(any(m.startswith('scipy') for m in sys.modules))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code])
+    assert output.decode().strip() == "False"
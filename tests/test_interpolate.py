@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from dft_dummy.bravis import BravisLattice, make_lattice_bravis
+from dft_dummy.crystal_utils import make_mesh
+from dft_dummy.interpolate import find_stars, fit_star_interpolation, star_matrix
+from dft_dummy.kpoints import find_irreducible_kpts
+from dft_dummy.symmetry import find_symmetry_ops, to_crystal_ops
+
+# nearest neighbours of the fcc lattice in crystal coordinates
+FCC_NN = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, -1, 0], [0, 1, -1], [1, 0, -1]])
+FCC_NN = np.vstack((FCC_NN, -FCC_NN))
+
+
+def fcc_band(kpts):
+    """a tight-binding band with first and second neighbour hoppings"""
+    phases = 2 * np.pi * kpts @ FCC_NN.T
+    return -np.cos(phases).sum(axis=1) + 0.3 * np.cos(2 * phases).sum(axis=1)
+
+
+def test_find_stars():
+    vec, _ = make_lattice_bravis(BravisLattice.fcc, a=1)
+    stars = find_stars(vec, 8)
+    assert stars.counts.tolist() == [1, 12, 6, 24, 12, 24, 8, 48]
+    assert np.all(np.diff(stars.lengths) > 0)
+    assert np.all(np.diff(stars.star) >= 0)
+    assert sorted(map(tuple, stars.points[1:13])) == sorted(map(tuple, FCC_NN))
+    with pytest.raises(ValueError):
+        find_stars(vec, 0)
+
+
+@pytest.mark.parametrize(
+    "kwargs,brav",
+    [
+        (dict(a=1), BravisLattice.fcc),
+        (dict(a=1, c=1.6), BravisLattice.hcp),
+        (dict(a=1, b=2, c=3, beta=1.2), BravisLattice.monoclinic),
+    ],
+)
+def test_star_symmetry(kwargs, brav):
+    vec, _ = make_lattice_bravis(brav, **kwargs)
+    stars = find_stars(vec, 30)
+    kpts = np.random.rand(10, 3)
+    smat = star_matrix(kpts, stars, chunk_size=100)
+    assert np.allclose(smat[:, 0], 1)
+    for op in to_crystal_ops(find_symmetry_ops(vec), vec):
+        assert np.allclose(star_matrix(kpts @ op.T, stars), smat)
+    assert np.allclose(star_matrix(-kpts, stars), smat)
+
+
+def test_fit_star_interpolation():
+    vec, _ = make_lattice_bravis(BravisLattice.fcc, a=1)
+    irr = find_irreducible_kpts(make_mesh(8, 8, 8), vec)
+    values = np.column_stack((fcc_band(irr.kpts), fcc_band(irr.kpts) ** 2))
+    interp = fit_star_interpolation(irr.kpts, values, vec)
+    assert np.allclose(interp.evaluate(irr.kpts), values)
+
+    kpts = np.random.rand(200, 3)
+    assert np.allclose(interp.evaluate(kpts)[:, 0], fcc_band(kpts), atol=0.05)
+    assert np.allclose(interp.evaluate(kpts, chunk_size=1), interp.evaluate(kpts))
+
+
+@pytest.mark.parametrize("mesh", [(6, 5, 4), (12, 12, 12, 1, 0, 1), (3, 3, 3, 1, 1, 1)])
+def test_evaluate_mesh(mesh):
+    vec, _ = make_lattice_bravis(BravisLattice.hcp, a=1, c=1.6)
+    irr = find_irreducible_kpts(make_mesh(6, 6, 4), vec)
+    interp = fit_star_interpolation(irr.kpts, np.sin(irr.kpts[:, 2]) ** 2, vec)
+    assert interp.evaluate_mesh(*mesh).shape == (np.prod(mesh[:3]), 1)
+    assert np.allclose(interp.evaluate_mesh(*mesh), interp.evaluate(make_mesh(*mesh)))
+
+
+def test_fit_star_interpolation_throw():
+    vec, _ = make_lattice_bravis(BravisLattice.cubic, a=1)
+    kpts = make_mesh(3, 3, 3)
+    with pytest.raises(ValueError):
+        fit_star_interpolation(kpts, np.zeros(len(kpts)), vec, num_stars=10)
@@ -1,8 +1,25 @@
+import numpy as np
 import pytest
 
 from dft_dummy.bravis import BravisLattice, make_lattice_bravis
 from dft_dummy.crystal_utils import make_mesh
-from dft_dummy.kpoints import reduce_kpts
+from dft_dummy.kpoints import (
+    embed_mesh,
+    find_irreducible_kpts,
+    find_kpts_images,
+    find_mesh_images,
+    iter_irreducible_mesh,
+    make_graph_matrix,
+    make_index_lookup,
+    make_kpts_index,
+    make_kpts_lookup,
+    reduce_kpts,
+    reduce_kpts_batch,
+    reduce_mesh,
+    refine_mesh,
+)
+from dft_dummy.stats import Stats
+from dft_dummy.symmetry import SymmetryMode
 
 
 @pytest.fixture
@@ -45,3 +62,299 @@ def test_reduce_kpts(kwargs, brav, npts_exp, labels_exp, kpts):
     npts, labels = reduce_kpts(kpts, vec)
     assert npts == npts_exp
     assert labels.tolist() == labels_exp
+
+
+@pytest.mark.parametrize(
+    "kwargs,brav,mesh,npts_exp",
+    [
+        (
+            dict(a=1, b=2, c=3, alpha=1.1, beta=1.2, gamma=1.3),
+            BravisLattice.triclinic,
+            (3, 3, 3),
+            14,
+        ),
+        (dict(a=1, c=3), BravisLattice.tetragonal, (4, 4, 4), 18),
+    ],
+)
+def test_reduce_kpts_boundary(kwargs, brav, mesh, npts_exp):
+    """rotated kpoints just below a periodic boundary are matched, these meshes
+    used to split into 18 and 19 kinds"""
+    vec, _ = make_lattice_bravis(brav, **kwargs)
+    kpts = make_mesh(*mesh)
+    npts, labels = reduce_kpts(kpts, vec)
+    assert npts == npts_exp
+    assert reduce_mesh(vec, *mesh)[1].tolist() == labels.tolist()
+    assert find_irreducible_kpts(kpts, vec).weights.sum() == len(kpts)
+
+
+@pytest.mark.parametrize("shift", [(0, 0, 0), (1, 0, 1)])
+def test_kpts_lookup_mesh(shift):
+    kpts = make_mesh(3, 4, 5, *shift)
+    lookup = make_kpts_lookup(kpts)
+    idx = np.arange(len(kpts))
+    assert lookup(kpts).tolist() == idx.tolist()
+    # periodic images are found as well
+    assert lookup(kpts + [1, -2, 3]).tolist() == idx.tolist()
+    assert lookup(kpts + 0.01).tolist() == [-1] * len(kpts)
+
+
+def test_kpts_lookup_hash():
+    kpts = np.random.rand(50, 3)
+    lookup = make_kpts_lookup(kpts)
+    idx = np.arange(len(kpts))
+    assert lookup(kpts).tolist() == idx.tolist()
+    assert lookup(kpts - 1).tolist() == idx.tolist()
+    assert lookup(kpts + 1e-3).tolist() == [-1] * len(kpts)
+    # points within tol are found across the boundaries of the rounded keys
+    noise = np.random.uniform(-0.5, 0.5, (len(kpts), 3)) * 1e-6
+    assert lookup(kpts + noise).tolist() == idx.tolist()
+
+
+@pytest.mark.parametrize(
+    "shift", [(0.9e-6, 0, 0), (0, -0.9e-6, 0), (0, 0, 0.9e-6), (0.5e-6,) * 3]
+)
+def test_kpts_lookup_hash_boundary(shift):
+    # kpoints around odd and half multiples of tol, where the edges of the keys are
+    edges = np.array([0.25 + 1e-6, 0.5 + 0.5e-6, 0.75 - 1.5e-6])
+    kpts = np.stack(np.meshgrid(edges, edges, edges), axis=-1).reshape(-1, 3)
+    kpts -= np.sign(shift) * np.abs(shift) / 2
+    lookup = make_kpts_lookup(kpts, tol=1e-6)
+    # offset by just under tol, the points are rounded to the next key
+    assert lookup(kpts + shift).tolist() == list(range(len(kpts)))
+    assert lookup(kpts + 1.2 * np.array(shift)).tolist() == [-1] * len(kpts)
+
+
+@pytest.mark.parametrize(
+    "kwargs,brav,mesh",
+    [
+        (dict(a=1), BravisLattice.fcc, (8, 8, 8, 1, 1, 1)),
+        (dict(a=1, c=1.6), BravisLattice.hcp, (9, 9, 6, 0, 0, 1)),
+        (
+            dict(a=1, b=2, c=3, alpha=1.1, beta=1.2, gamma=1.3),
+            BravisLattice.triclinic,
+            (5, 4, 3),
+        ),
+    ],
+)
+def test_reduce_kpts_float32(kwargs, brav, mesh):
+    vec, _ = make_lattice_bravis(brav, **kwargs)
+    kpts = make_mesh(*mesh)
+    npts, labels = reduce_kpts(kpts, vec)
+    npts32, labels32 = reduce_kpts(kpts, vec, dtype=np.float32)
+    assert npts32 == npts
+    assert labels32.tolist() == labels.tolist()
+    # not a complete mesh, searched by hash
+    npts32, labels32 = reduce_kpts(kpts[1:], vec, dtype=np.float32)
+    assert labels32.tolist() == reduce_kpts(kpts[1:], vec)[1].tolist()
+
+    ibz = find_irreducible_kpts(kpts, vec, dtype=np.float32)
+    assert ibz.kpts.dtype == np.float32
+    assert ibz.weights.sum() == len(kpts)
+
+
+def test_reduce_kpts_skewed(kpts):
+    vec, _ = make_lattice_bravis(BravisLattice.fcc, a=1)
+    skewed = np.array([[1, 0, 0], [300, 1, 0], [2000, 700, 1]]) @ vec
+    # a Gamma centred mesh is the same set of kpoints in any basis
+    npts, _ = reduce_kpts(kpts, vec)
+    assert reduce_kpts(kpts, skewed)[0] == npts
+    assert reduce_mesh(skewed, 4, 4, 4)[0] == npts
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_make_index_lookup(dtype):
+    for kpts in (make_mesh(3, 4, 5, 1, 0, 0), np.random.rand(50, 3) - 0.5):
+        kpts = kpts.astype(dtype)
+        index = make_kpts_index(kpts)
+        # only arrays, which can be shared between processes
+        assert all(isinstance(arr, np.ndarray) for arr in index)
+        pts = np.vstack((kpts + 2, kpts + 0.01))
+        lookup = make_index_lookup(kpts, index)
+        assert lookup(pts).tolist() == make_kpts_lookup(kpts)(pts).tolist()
+        assert lookup(kpts).tolist() == list(range(len(kpts)))
+
+
+def test_kpts_lookup_dtype():
+    kpts = make_mesh(3, 4, 5, dtype=np.float32)
+    for pts in (kpts, np.random.rand(50, 3).astype(np.float32)):
+        idx = make_kpts_lookup(pts)(pts)
+        assert idx.dtype == np.int32
+        assert idx.tolist() == list(range(len(pts)))
+
+
+def test_find_kpts_images(kpts):
+    vec, _ = make_lattice_bravis(BravisLattice.fcc, a=1)
+    images = find_kpts_images(kpts, vec, np.array([np.eye(3), -np.eye(3)]))
+    assert images[0].tolist() == list(range(len(kpts)))
+    assert np.allclose(kpts[images[1]] + kpts, np.round(kpts[images[1]] + kpts))
+
+
+def test_make_graph_matrix():
+    images = np.array([[0, 1, 2], [1, -1, 0]])
+    graph = make_graph_matrix(images).toarray()
+    assert graph.tolist() == [[1, 1, 0], [0, 1, 0], [1, 0, 1]]
+
+
+@pytest.mark.parametrize(
+    "kwargs,brav,labels_exp",
+    [
+        (dict(a=1), BravisLattice.fcc, FCC_LABELS),
+        (dict(a=1, c=2), BravisLattice.hcp, HCP_LABELS),
+    ],
+)
+def test_find_irreducible_kpts(kwargs, brav, labels_exp, kpts):
+    vec, _ = make_lattice_bravis(brav, **kwargs)
+    ibz = find_irreducible_kpts(kpts, vec)
+    assert ibz.labels.tolist() == labels_exp
+    assert ibz.weights.tolist() == np.bincount(labels_exp).tolist()
+    assert np.isclose(ibz.normalized_weights.sum(), 1)
+    assert np.allclose(ibz.kpts, kpts[ibz.index])
+    assert ibz.unfold(np.arange(len(ibz.kpts))).tolist() == labels_exp
+    # every kpoint is turned into its irreducible kpoint by the recorded op
+    assert np.all(ibz.op_index >= 0)
+    images = find_kpts_images(kpts, vec, ibz.ops)
+    assert np.all(images[ibz.op_index, np.arange(len(kpts))] == ibz.index[ibz.labels])
+
+
+@pytest.mark.parametrize(
+    "kwargs,brav",
+    [
+        (dict(a=1), BravisLattice.fcc),
+        (dict(a=1), BravisLattice.bcc),
+        (dict(a=1, c=2), BravisLattice.hcp),
+        (dict(a=1, b=2, c=3, beta=1.2), BravisLattice.monoclinic),
+    ],
+)
+@pytest.mark.parametrize(
+    "mesh", [(4, 4, 4, 0, 0, 0), (6, 6, 4, 1, 1, 1), (3, 5, 4, 1, 0, 0)]
+)
+def test_reduce_mesh(kwargs, brav, mesh):
+    vec, _ = make_lattice_bravis(brav, **kwargs)
+    npts_exp, labels_exp = reduce_kpts(make_mesh(*mesh), vec)
+    npts, labels = reduce_mesh(vec, *mesh)
+    assert npts == npts_exp
+    assert labels.tolist() == labels_exp.tolist()
+
+
+def test_find_mesh_images():
+    # a 90 deg rotation about the 3rd axis swaps the 1st and 2nd axes
+    ops = np.array([np.eye(3), [[0, -1, 0], [1, 0, 0], [0, 0, 1]]], dtype=int)
+    kpts = make_mesh(4, 4, 2, 1, 1, 0)
+    images = find_mesh_images(ops, (4, 4, 2), (1, 1, 0))
+    assert images[0].tolist() == list(range(len(kpts)))
+    rotated = kpts @ ops[1].T
+    assert np.allclose(kpts[images[1]], rotated - np.floor(rotated))
+    # the offset is not kept along the 1st axis, so no point stays on the mesh
+    assert np.all(find_mesh_images(ops, (4, 4, 2), (1, 0, 0))[1] == -1)
+    # nor for meshes of different sizes
+    assert np.all(find_mesh_images(ops, (4, 2, 2), (0, 0, 0), [2, 6])[1] == -1)
+
+
+@pytest.mark.parametrize(
+    "mode,npts_exp",
+    [
+        (SymmetryMode.full, 10),
+        (SymmetryMode.rotations, 10),
+        (SymmetryMode.time_reversal, 36),  # 8 points are their own inverse
+    ],
+)
+def test_reduce_kpts_mode(mode, npts_exp, kpts):
+    vec, _ = make_lattice_bravis(BravisLattice.cubic, a=1)
+    npts, labels = reduce_kpts(kpts, vec, mode=mode)
+    assert npts == npts_exp
+    npts_mesh, labels_mesh = reduce_mesh(vec, 4, 4, 4, mode=mode)
+    assert npts_mesh == npts
+    assert labels_mesh.tolist() == labels.tolist()
+    ibz = find_irreducible_kpts(kpts, vec, mode=mode)
+    assert ibz.labels.tolist() == labels.tolist()
+
+
+def test_reduce_kpts_ops(kpts):
+    vec, _ = make_lattice_bravis(BravisLattice.cubic, a=1)
+    npts, labels = reduce_kpts(kpts, vec, ops=np.eye(3))
+    assert npts == len(kpts)
+    assert labels.tolist() == list(range(len(kpts)))
+    # a mirror through the 1st axis, only points on the plane x = 0 or 1/2 stay
+    mirror = np.diag([-1.0, 1, 1])
+    npts, _ = reduce_kpts(kpts, vec, ops=[np.eye(3), mirror])
+    assert npts == 48
+
+
+def test_ops_without_identity(kpts):
+    vec, _ = make_lattice_bravis(BravisLattice.cubic, a=1)
+    ibz = find_irreducible_kpts(kpts, vec, ops=-np.eye(3))
+    assert len(ibz.kpts) == 36
+    assert ibz.weights.sum() == len(kpts)
+    assert np.all(ibz.op_index >= 0)
+    assert np.allclose(ibz.ops[ibz.op_index[ibz.index]], np.eye(3))
+    blocks = list(iter_irreducible_mesh(vec, 4, 4, 4, ops=-np.eye(3)))
+    index, _, weights = (np.concatenate(arrs) for arrs in zip(*blocks))
+    assert index.tolist() == ibz.index.tolist()
+    assert weights.tolist() == ibz.weights.tolist()
+
+
+@pytest.mark.parametrize(
+    "kwargs,brav",
+    [
+        (dict(a=1), BravisLattice.bcc),
+        (dict(a=1, c=2), BravisLattice.hcp),
+    ],
+)
+@pytest.mark.parametrize("mesh", [(4, 4, 4, 0, 0, 0), (6, 6, 4, 1, 1, 1)])
+def test_iter_irreducible_mesh(kwargs, brav, mesh):
+    vec, _ = make_lattice_bravis(brav, **kwargs)
+    ibz = find_irreducible_kpts(make_mesh(*mesh), vec)
+    blocks = list(iter_irreducible_mesh(vec, *mesh, chunk_size=10))
+    index, kpts, weights = (np.concatenate(arrs) for arrs in zip(*blocks))
+    assert index.tolist() == ibz.index.tolist()
+    assert np.allclose(kpts, ibz.kpts)
+    assert weights.tolist() == ibz.weights.tolist()
+    with pytest.raises(ValueError):
+        next(iter_irreducible_mesh(vec, *mesh, chunk_size=0))
+
+
+@pytest.mark.parametrize(
+    "kwargs,brav,old,new",
+    [
+        (dict(a=1, c=2), BravisLattice.hcp, (4, 4, 4, 0, 0, 0), (8, 8, 8, 0, 0, 0)),
+        (dict(a=1, c=2), BravisLattice.hcp, (2, 2, 2, 1, 1, 1), (6, 6, 6, 1, 1, 1)),
+        (dict(a=1, c=2), BravisLattice.hcp, (2, 2, 2, 1, 1, 1), (4, 4, 4, 0, 0, 0)),
+        # new points are equivalent to old ones, e.g. (1/4, 0, 0) to (0, 1/4, 0)
+        (dict(a=1), BravisLattice.cubic, (2, 4, 4, 0, 0, 0), (4, 8, 8, 0, 0, 0)),
+    ],
+)
+def test_refine_mesh(kwargs, brav, old, new):
+    vec, _ = make_lattice_bravis(brav, **kwargs)
+    _, old_labels = reduce_mesh(vec, *old)
+    npts_exp, labels_exp = reduce_mesh(vec, *new)
+    npts, labels = refine_mesh(vec, old_labels, old[:3], old[3:], new[:3], new[3:])
+    assert npts == npts_exp
+    assert labels.tolist() == labels_exp.tolist()
+
+
+def test_embed_mesh():
+    index = embed_mesh((2, 1, 2), (1, 0, 0), (6, 2, 4), (1, 0, 0))
+    assert np.allclose(make_mesh(6, 2, 4, 1)[index], make_mesh(2, 1, 2, 1))
+    for nums, shifts in [((6, 2, 3), (1, 0, 0)), ((4, 2, 4), (1, 0, 0))]:
+        with pytest.raises(ValueError):
+            embed_mesh((2, 1, 2), (1, 0, 0), nums, shifts)
+
+
+def test_reduce_kpts_batch(kpts):
+    params = [
+        (BravisLattice.fcc, dict(a=1)),
+        (BravisLattice.hcp, dict(a=1, c=2)),
+        (BravisLattice.fcc, dict(a=2)),
+        (BravisLattice.bcc, dict(a=1)),
+        (BravisLattice.hcp, dict(a=2, c=3)),
+    ]
+    vecs = np.array([make_lattice_bravis(brav, **kw)[0] for brav, kw in params])
+    stats = Stats()
+    results = reduce_kpts_batch(kpts, vecs, stats=stats)
+    assert stats.counters["groups"] == 3
+    assert len(results) == len(vecs)
+    for vec, (npts, labels) in zip(vecs, results):
+        npts_exp, labels_exp = reduce_kpts(kpts, vec)
+        assert npts == npts_exp
+        assert labels.tolist() == labels_exp.tolist()
+    assert results[0][1] is results[2][1]
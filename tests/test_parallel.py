@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from dft_dummy.bravis import BravisLattice, make_lattice_bravis
+from dft_dummy.crystal_utils import make_mesh
+from dft_dummy.kpoints import find_kpts_images, find_valid_ops, reduce_kpts
+from dft_dummy.parallel import find_kpts_images_parallel
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_reduce_kpts_parallel(workers):
+    vec, _ = make_lattice_bravis(BravisLattice.hcp, a=1, c=2)
+    kpts = make_mesh(6, 6, 4, 0, 0, 1)
+    npts, labels = reduce_kpts(kpts, vec)
+    npts_par, labels_par = reduce_kpts(kpts, vec, workers=workers)
+    assert npts_par == npts
+    assert labels_par.tolist() == labels.tolist()
+
+
+def test_find_kpts_images_parallel():
+    vec, _ = make_lattice_bravis(BravisLattice.fcc, a=1)
+    kpts = np.random.rand(20, 3)
+    ops = find_valid_ops(vec)
+    images = find_kpts_images(kpts, vec, ops)
+    images_par = find_kpts_images(kpts, vec, ops, workers=4)
+    assert np.array_equal(images_par, images)
+    kpts = make_mesh(4, 4, 4)
+    images = find_kpts_images(kpts, vec, ops, dtype=np.float32)
+    images_par = find_kpts_images(kpts, vec, ops, workers=2, dtype=np.float32)
+    assert np.array_equal(images_par, images)
+
+
+def test_parallel_throw():
+    with pytest.raises(ValueError):
+        find_kpts_images_parallel(np.zeros((1, 3)), np.eye(3)[None], workers=-1)
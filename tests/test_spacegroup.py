@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from dft_dummy.bravis import BravisLattice, make_lattice_bravis
+from dft_dummy.spacegroup import find_space_group
+
+FCC = np.array([[0, 0, 0], [0, 0.5, 0.5], [0.5, 0, 0.5], [0.5, 0.5, 0]])
+
+
+def check_space_group(sg, positions, species, vec=None):
+    """every operation maps every atom onto an atom of the same species, also with
+    the cartisian ops if the lattice is given"""
+    species = np.asarray(species)
+    rotations = [sg.rotations]
+    if vec is not None:
+        rotations.append(vec @ np.swapaxes(sg.ops, 1, 2) @ np.linalg.inv(vec))
+    for rots in rotations:
+        for rot, trans in zip(rots, sg.translations):
+            moved = positions @ rot + trans
+            diff = moved[:, None] - positions[None]
+            close = np.all(np.abs(diff - np.round(diff)) < 1e-6, axis=2)
+            assert np.all(close.any(axis=1))
+            assert np.all(species[close.argmax(axis=1)] == species)
+
+
+@pytest.mark.parametrize(
+    "positions,species,num_ops,num_shifted",
+    [
+        ([[0, 0, 0], [0.5, 0.5, 0.5]], ["Na", "Cl"], 48, 0),
+        ([[0, 0, 0], [0.25, 0.25, 0.25]], ["Si", "Si"], 48, 24),
+        ([[0, 0, 0], [0.25, 0.25, 0.25]], ["Ga", "As"], 24, 0),
+    ],
+)
+def test_fcc_crystals(positions, species, num_ops, num_shifted):
+    vec, _ = make_lattice_bravis(BravisLattice.fcc, a=1)
+    positions = np.array(positions)
+    sg = find_space_group(vec, positions, species)
+    assert len(sg.rotations) == num_ops
+    assert np.count_nonzero(sg.translations.any(axis=1)) == num_shifted
+    assert len(sg.point_group) == num_ops
+    check_space_group(sg, positions, species, vec)
+
+
+def test_hcp():
+    vec, _ = make_lattice_bravis(BravisLattice.hcp, a=1, c=1.633)
+    positions = np.array([[1 / 3, 2 / 3, 0.25], [2 / 3, 1 / 3, 0.75]])
+    sg = find_space_group(vec, positions, [1, 1])
+    assert len(sg.rotations) == 24
+    assert np.count_nonzero(sg.translations.any(axis=1)) == 12
+    check_space_group(sg, positions, [1, 1], vec)
+
+
+def test_screw_axis():
+    """P4_1, the 4_1 screws are not their own inverse and their translations
+    differ from the ones of the inverse"""
+    vec, _ = make_lattice_bravis(BravisLattice.tetragonal, a=1, c=1.7)
+    x, y, z = 0.13, 0.27, 0.05
+    positions = np.array(
+        [[x, y, z], [-y, x, z + 0.25], [-x, -y, z + 0.5], [y, -x, z + 0.75]]
+    )
+    sg = find_space_group(vec, positions % 1, [1] * 4)
+    assert len(sg.rotations) == 4
+    assert sorted(sg.translations[:, 2].tolist()) == [0, 0.25, 0.5, 0.75]
+    check_space_group(sg, positions % 1, [1] * 4, vec)
+
+
+def test_supercell():
+    """the pure translations of a conventional diamond supercell, with and without
+    a displaced atom"""
+    cells = np.stack(np.meshgrid(*[range(2)] * 3), axis=-1).reshape(-1, 1, 3)
+    basis = np.vstack((FCC, FCC + 0.25))
+    positions = ((basis + cells) / 2).reshape(-1, 3)
+    species = ["Si"] * len(positions)
+    sg = find_space_group(2 * np.eye(3), positions, species, chunk_size=100)
+    assert len(sg.rotations) == 48 * 32
+    assert np.all(sg.rotations[:32] == np.eye(3))
+    assert len(sg.point_group) == 48
+    check_space_group(sg, positions, species, 2 * np.eye(3))
+
+    positions[5] += 0.01
+    sg = find_space_group(2 * np.eye(3), positions, species, chunk_size=100)
+    assert len(sg.rotations) < 48
+    assert len(sg.point_group) == len(sg.rotations)
+    check_space_group(sg, positions, species, 2 * np.eye(3))
+
+
+def test_invalid_species():
+    with pytest.raises(ValueError):
+        find_space_group(np.eye(3), np.zeros((2, 3)), ["Si"])
+    with pytest.raises(ValueError):
+        find_space_group(np.eye(3), np.zeros((0, 3)), [])
@@ -0,0 +1,50 @@
+import numpy as np
+
+from dft_dummy.bravis import BravisLattice, make_lattice_bravis
+from dft_dummy.crystal_utils import make_mesh
+from dft_dummy.kpoints import reduce_kpts, reduce_mesh
+from dft_dummy.stats import NULL_STATS, Stats
+from dft_dummy.symmetry import clear_symmetry_cache
+
+
+def test_stats():
+    calls = []
+    stats = Stats(callback=lambda name, elapsed: calls.append(name))
+    for _ in range(2):
+        with stats.phase("a"):
+            pass
+    stats.count("b")
+    stats.count("b", 2)
+    stats.peak("c", np.zeros(4))
+    stats.peak("c", np.zeros(2))
+    assert calls == ["a", "a"]
+    assert stats.timers["a"] >= 0
+    assert stats.counters == dict(b=3)
+    assert stats.peaks == dict(c=32)
+
+
+def test_null_stats():
+    with NULL_STATS.phase("a"):
+        NULL_STATS.count("b")
+        NULL_STATS.peak("c", np.zeros(4))
+    assert not NULL_STATS.enabled
+    assert NULL_STATS.timers == NULL_STATS.counters == NULL_STATS.peaks == {}
+
+
+def test_reduce_kpts_stats():
+    vec, _ = make_lattice_bravis(BravisLattice.hcp, a=1, c=2)
+    kpts = make_mesh(4, 4, 4)
+    clear_symmetry_cache()
+    stats = Stats()
+    reduce_kpts(kpts, vec, stats=stats)
+    assert stats.counters["valid_ops"] == 12
+    assert stats.counters["unmatched"] == 0
+    assert stats.counters["edges"] == 24 * 64
+    assert {"symmetry", "rotate", "lookup", "graph", "components"} <= set(stats.timers)
+    assert stats.peaks["images"] == 24 * 64 * 4  # int32 indices
+
+    stats = Stats()
+    reduce_mesh(vec, 4, 4, 4, stats=stats)
+    assert stats.counters["symmetry_cache_hits"] == 1
+    assert "symmetry" not in stats.timers
+    assert stats.counters["unmatched"] == 0
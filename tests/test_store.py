@@ -0,0 +1,103 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from dft_dummy import store
+from dft_dummy.bravis import BravisLattice, make_lattice_bravis
+from dft_dummy.crystal_utils import make_mesh
+from dft_dummy.kpoints import find_irreducible_kpts
+
+
+def test_save_load_arrays(tmp_path):
+    path = str(tmp_path / "arrays")
+    arrays = dict(
+        a=np.random.rand(5, 3),
+        b=np.arange(7, dtype=np.int32),
+        c=np.empty((0, 3)),
+    )
+    store.save_arrays(path, arrays, dict(x=1))
+    for mmap in (True, False):
+        loaded, meta = store.load_arrays(path, mmap=mmap)
+        assert meta == dict(x=1)
+        assert loaded.keys() == arrays.keys()
+        for k, v in arrays.items():
+            assert loaded[k].dtype == v.dtype
+            assert np.array_equal(loaded[k], v)
+    assert isinstance(store.load_arrays(path)[0]["a"], np.memmap)
+    assert os.listdir(tmp_path) == ["arrays"]  # no temporary file left
+
+
+def test_load_invalid(tmp_path):
+    path = tmp_path / "invalid"
+    path.write_bytes(b"not a store file")
+    with pytest.raises(ValueError):
+        store.load_arrays(str(path))
+
+
+def test_load_schema(tmp_path, monkeypatch):
+    path = str(tmp_path / "arrays")
+    monkeypatch.setattr(store, "SCHEMA_VERSION", 0)
+    store.save_arrays(path, dict(a=np.zeros(3)))
+    monkeypatch.undo()
+    with pytest.raises(ValueError):
+        store.load_arrays(path)
+
+
+def test_mesh_key():
+    vec, _ = make_lattice_bravis(BravisLattice.fcc, a=1)
+    key = store.mesh_key(vec, (4, 4, 4))
+    assert key == store.mesh_key(vec + 1e-9, (4, 4, 4))
+    assert key != store.mesh_key(vec, (4, 4, 4), (True, False, False))
+    assert key != store.mesh_key(vec, (4, 4, 2))
+    assert key != store.mesh_key(2 * vec, (4, 4, 4))
+
+
+def test_cached_irreducible_kpts(tmp_path, monkeypatch):
+    root = str(tmp_path / "store")
+    vec, _ = make_lattice_bravis(BravisLattice.hcp, a=1, c=2)
+    kpts, ibz = store.cached_irreducible_kpts(root, vec, 4, 4, 2, dz=True)
+    assert np.array_equal(kpts, make_mesh(4, 4, 2, dz=True))
+    assert len(os.listdir(root)) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("should be loaded from the store")
+
+    monkeypatch.setattr(store, "find_irreducible_kpts", fail)
+    kpts_cached, ibz_cached = store.cached_irreducible_kpts(root, vec, 4, 4, 2, dz=True)
+    assert np.array_equal(kpts_cached, kpts)
+    for field, value in ibz._asdict().items():
+        assert np.array_equal(getattr(ibz_cached, field), value)
+    labels_exp = find_irreducible_kpts(kpts, vec).labels
+    assert ibz_cached.labels.tolist() == labels_exp.tolist()
+
+
+@pytest.mark.parametrize("damage", ["schema", "truncated", "garbage", "header"])
+def test_cached_irreducible_kpts_unreadable(tmp_path, monkeypatch, damage):
+    root = str(tmp_path)
+    vec, _ = make_lattice_bravis(BravisLattice.fcc, a=1)
+    kpts, ibz = store.cached_irreducible_kpts(root, vec, 4, 4, 4)
+    path = os.path.join(root, store.mesh_key(vec, (4, 4, 4)))
+    if damage == "schema":
+        monkeypatch.setattr(store, "SCHEMA_VERSION", 0)
+        store.save_arrays(path, dict(mesh=kpts, **ibz._asdict()))
+        monkeypatch.undo()
+    elif damage == "truncated":
+        os.truncate(path, os.path.getsize(path) - 100)
+    elif damage == "garbage":
+        with open(path, "wb") as f:
+            f.write(b"not a store file")
+    else:
+        header = json.dumps(dict(schema=store.SCHEMA_VERSION)).encode()
+        with open(path, "wb") as f:
+            f.write(store._MAGIC + np.uint64(len(header)).tobytes() + header)
+    with pytest.raises((KeyError, ValueError)):
+        store.load_arrays(path)
+
+    # the entry is recomputed and overwritten, then loaded again
+    kpts_new, ibz_new = store.cached_irreducible_kpts(root, vec, 4, 4, 4)
+    assert np.array_equal(kpts_new, kpts)
+    assert ibz_new.labels.tolist() == ibz.labels.tolist()
+    assert store.load_arrays(path)[1]["fingerprint"] == store.lattice_fingerprint(vec)
+    assert os.listdir(root) == [os.path.basename(path)]
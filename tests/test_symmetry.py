@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 
 from dft_dummy import bravis, symmetry
@@ -40,3 +41,98 @@ def test_symmetry(bravis_kwargs, symmetry_ops):
         if symmetry.check_symmetry(sym, vec, overlap)
     ]
     assert POSSIBLE_OPS.get(brav) == valid_ops
+
+
+def test_find_symmetry_ops(bravis_kwargs, symmetry_ops):
+    brav, kwargs = bravis_kwargs
+    vec, _ = bravis.make_lattice_bravis(brav, **kwargs)
+    symmetry.clear_symmetry_cache()
+    ops = symmetry.find_symmetry_ops(vec)
+    assert np.array_equal(ops, symmetry_ops[POSSIBLE_OPS[brav]])
+    # the same (within tolerance) lattice is taken from the cache
+    assert symmetry.find_symmetry_ops(vec + 1e-9) is ops
+    assert not ops.flags.writeable
+
+
+def test_symmetry_cache_size(monkeypatch):
+    monkeypatch.setattr(symmetry, "SYMMETRY_CACHE_SIZE", 2)
+    symmetry.clear_symmetry_cache()
+    ops = [symmetry.find_symmetry_ops(a * np.eye(3)) for a in (1, 2, 3)]
+    assert symmetry.find_symmetry_ops(3 * np.eye(3)) is ops[2]
+    assert symmetry.find_symmetry_ops(1 * np.eye(3)) is not ops[0]
+
+
+def test_check_symmetries(bravis_kwargs, symmetry_ops):
+    brav, kwargs = bravis_kwargs
+    vec, _ = bravis.make_lattice_bravis(brav, **kwargs)
+    syms = symmetry.with_inversion(symmetry_ops)
+    valid = symmetry.check_symmetries(syms, vec)
+    assert valid.shape == (64,)
+    assert np.flatnonzero(valid[:32]).tolist() == POSSIBLE_OPS[brav]
+    assert np.array_equal(valid[:32], valid[32:])
+
+
+def test_check_symmetries_batch(symmetry_ops):
+    brav = bravis.BravisLattice
+    vecs = np.array(
+        [
+            bravis.make_lattice_bravis(brav.cubic, a=1)[0],
+            bravis.make_lattice_bravis(brav.hcp, a=1, c=2)[0],
+            bravis.make_lattice_bravis(brav.orthorhombic, a=1, b=2, c=3)[0],
+        ]
+    )
+    valid = symmetry.check_symmetries(symmetry_ops, vecs)
+    assert valid.shape == (3, 32)
+    for vec, mask in zip(vecs, valid):
+        expected = [symmetry.check_symmetry(sym, vec) for sym in symmetry_ops]
+        assert mask.tolist() == expected
+
+
+def test_crystal_ops(bravis_kwargs, symmetry_ops):
+    brav, kwargs = bravis_kwargs
+    vec, _ = bravis.make_lattice_bravis(brav, **kwargs)
+    syms = symmetry_ops[POSSIBLE_OPS[brav]]
+    ops = symmetry.to_crystal_ops(syms, vec)
+    assert ops.dtype == np.int64
+    assert np.allclose(symmetry.to_cartesian_ops(ops, vec), syms)
+    invalid = [i for i in range(32) if i not in POSSIBLE_OPS[brav]]
+    if invalid:
+        with pytest.raises(ValueError):
+            symmetry.to_crystal_ops(symmetry_ops[invalid], vec)
+
+
+SKEW = np.array([[1, 0, 0], [300, 1, 0], [2000, 700, 1]])
+
+
+def test_skewed_basis(bravis_kwargs, symmetry_ops):
+    brav, kwargs = bravis_kwargs
+    vec, _ = bravis.make_lattice_bravis(brav, **kwargs)
+    symmetry.clear_symmetry_cache()
+    # the same lattice in a strongly skewed basis, skewed = SKEW @ vec
+    ops = symmetry.find_symmetry_ops(SKEW @ vec)
+    assert np.array_equal(ops, symmetry_ops[POSSIBLE_OPS[brav]])
+    ops_crys = symmetry.to_crystal_ops(ops, SKEW @ vec)
+    inv_skew = np.round(np.linalg.inv(SKEW)).astype(int)
+    assert np.array_equal(ops_crys, SKEW @ symmetry.to_crystal_ops(ops, vec) @ inv_skew)
+
+
+@pytest.mark.parametrize(
+    "mode,nops",
+    [
+        (symmetry.SymmetryMode.full, 24),
+        (symmetry.SymmetryMode.rotations, 12),
+        (symmetry.SymmetryMode.time_reversal, 2),
+    ],
+)
+def test_select_symmetry_ops(mode, nops):
+    vec, _ = bravis.make_lattice_bravis(bravis.BravisLattice.hcp, a=1, c=2)
+    ops = symmetry.select_symmetry_ops(vec, mode)
+    assert len(ops) == nops
+    assert np.allclose(ops[0], np.eye(3))
+    if mode == symmetry.SymmetryMode.rotations:
+        assert np.allclose(np.linalg.det(ops), 1)
+
+
+def test_select_symmetry_ops_throw():
+    with pytest.raises(ValueError):
+        symmetry.select_symmetry_ops(np.eye(3), "unknown")
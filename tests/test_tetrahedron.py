@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from dft_dummy.bravis import BravisLattice, make_lattice_bravis
+from dft_dummy.crystal_utils import make_mesh
+from dft_dummy.kpoints import reduce_kpts
+from dft_dummy.tetrahedron import (
+    find_fermi_level,
+    make_tetrahedra,
+    reduce_tetrahedra,
+    tetrahedron_dos,
+    tetrahedron_weights,
+)
+
+FCC_NN = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, -1, 0], [0, 1, -1], [1, 0, -1]])
+
+
+@pytest.fixture(scope="module")
+def free_electrons():
+    """energies |k|^2 of a cubic lattice, the occupied states are a sphere"""
+    vec, _ = make_lattice_bravis(BravisLattice.cubic, a=1)
+    kpts = make_mesh(16, 16, 16)
+    kpts -= np.round(kpts)
+    return np.sum(kpts ** 2, axis=1), make_tetrahedra(vec, 16, 16, 16)
+
+
+@pytest.mark.parametrize(
+    "kwargs,brav,mesh",
+    [
+        (dict(a=1), BravisLattice.cubic, (4, 4, 4)),
+        (dict(a=1), BravisLattice.fcc, (3, 4, 5)),
+        (dict(a=1, c=1.6), BravisLattice.hcp, (6, 6, 3)),
+    ],
+)
+def test_make_tetrahedra(kwargs, brav, mesh):
+    vec, _ = make_lattice_bravis(brav, **kwargs)
+    tetra = make_tetrahedra(vec, *mesh)
+    npts = np.prod(mesh)
+    assert tetra.corners.shape == (6 * npts, 4)
+    assert np.allclose(tetra.volumes.sum(), 1)
+    # every point is a corner of 24 tetrahedra, which fill the mesh
+    assert np.all(np.bincount(tetra.corners.ravel()) == 24)
+    kpts = make_mesh(*mesh)
+    edges = kpts[tetra.corners[:, 1:]] - kpts[tetra.corners[:, :1]]
+    edges -= np.round(edges)
+    assert np.allclose(np.abs(np.linalg.det(edges)) / 6, 1 / (6 * npts))
+    with pytest.raises(ValueError):
+        make_tetrahedra(vec, 0, 1, 1)
+
+
+def test_free_electrons(free_electrons):
+    energies, tetra = free_electrons
+    omegas = np.array([0.2, 0.1, 0.0, 1.0])
+    dos, number = tetrahedron_dos(energies, tetra, omegas, chunk_size=1000)
+    radius = np.sqrt(omegas[:2])
+    assert np.allclose(number[:2], 4 / 3 * np.pi * radius ** 3, rtol=5e-2)
+    assert np.allclose(dos[:2], 2 * np.pi * radius, rtol=5e-2)
+    assert np.allclose(number[2:], [0, 1])
+
+    num_states = 4 / 3 * np.pi * radius[0] ** 3
+    fermi = find_fermi_level(energies, tetra, num_states)
+    assert np.isclose(tetrahedron_dos(energies, tetra, [fermi])[1][0], num_states)
+    # the correction brings the band energy much closer to the exact one
+    exact = 4 * np.pi * radius[0] ** 5 / 5
+    errors = []
+    for correction in (False, True):
+        weights = tetrahedron_weights(energies, tetra, fermi, correction)
+        assert weights.shape == (len(energies), 1)
+        assert np.isclose(weights.sum(), num_states)
+        errors.append(abs(np.sum(weights[:, 0] * energies) - exact))
+    assert errors[1] < errors[0] / 100
+    with pytest.raises(ValueError):
+        find_fermi_level(energies, tetra, 2)
+
+
+def test_reduce_tetrahedra():
+    vec, _ = make_lattice_bravis(BravisLattice.fcc, a=1)
+    kpts = make_mesh(8, 8, 8, 1, 1, 1)
+    phases = 2 * np.pi * kpts @ np.vstack((FCC_NN, -FCC_NN)).T
+    energies = np.column_stack((-np.cos(phases).sum(axis=1), np.cos(2 * phases).sum(1)))
+    tetra = make_tetrahedra(vec, 8, 8, 8)
+    _, labels = reduce_kpts(kpts, vec)
+    reduced = reduce_tetrahedra(tetra, labels)
+    assert len(reduced.corners) < len(tetra.corners) / 10
+    assert reduced.weights.sum() == len(tetra.corners)
+
+    _, index = np.unique(labels, return_index=True)
+    omegas = np.linspace(-5, 13, 50)
+    for full, irr in zip(
+        tetrahedron_dos(energies, tetra, omegas),
+        tetrahedron_dos(energies[index], reduced, omegas),
+    ):
+        assert np.allclose(full, irr)
+    fermi = find_fermi_level(energies[index], reduced, 1.2)
+    weights = tetrahedron_weights(energies, tetra, fermi)
+    weights_irr = tetrahedron_weights(energies[index], reduced, fermi)
+    summed = np.array([np.bincount(labels, band) for band in weights.T]).T
+    assert np.allclose(summed, weights_irr)
+    assert np.isclose(weights_irr.sum(), 1.2)
+
+
+@pytest.mark.parametrize("scale", [1e-7, 1, 1e7, 1e12])
+def test_find_fermi_level_scale(scale):
+    vec, _ = make_lattice_bravis(BravisLattice.cubic, a=1)
+    energies = np.cos(2 * np.pi * make_mesh(4, 4, 4)).sum(axis=1)
+    tetra = make_tetrahedra(vec, 4, 4, 4)
+    fermi = find_fermi_level(energies, tetra, 0.3)
+    # the tolerance is relative to the width of the bands, so the search stops
+    assert np.isclose(find_fermi_level(energies * scale, tetra, 0.3), fermi * scale)
+    assert find_fermi_level(energies * scale, tetra, 0.3, tol=0) == pytest.approx(
+        fermi * scale
+    )